@@ -73,8 +73,17 @@ def recipe_test():
     recipe_covhtml()
 
 
+def recipe_bench():
+    print("Executing frame time benchmark...")
+    cmd = ['python', 'src/bench.py', '--output', 'bench.json']
+    if os.path.exists('bench_baseline.json'):
+        cmd += ['--baseline', 'bench_baseline.json']
+    cmd_exec(cmd)
+
+
 if not len(sys.argv):
-    exclude = ['recipe_test', 'recipe_coverage', 'recipe_coverase']
+    exclude = ['recipe_test', 'recipe_coverage', 'recipe_coverase',
+               'recipe_bench']
     sys.argv = list(
         filter(
             lambda x: x.startswith('recipe_') and x not in exclude, globals()))
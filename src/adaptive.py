@@ -0,0 +1,236 @@
+"""
+Adaptive difficulty for infinite mode. Instead of switching from easy to
+medium to hard problems at fixed scores, a `SkillModel` keeps track of how
+well the player does at each kind of problem, and asks the kinds of problems
+that the player is about ready for.
+
+Problems are sorted into categories by their operator and by the size of
+their operands. For each category, the model keeps an Elo-style rating of
+the player's skill, which is compared with the difficulty of the category to
+predict how likely the player is to get its problems right, and quickly.
+Every answer nudges the rating of its category towards what actually
+happened, along with a running average of how long answers take, so keeping
+the model up to date takes constant time no matter how long it has been
+playing.
+
+Categories are drawn at random, weighted towards the ones that the player is
+expected to get right about three times out of four, which keeps problems
+challenging without being discouraging. The model can be turned into a small
+dictionary and back, so that it can be kept in the user data between
+sessions.
+"""
+import math
+import random
+
+import arithmetic
+
+OPERATORS = ('+', '-', '*', '/')
+"""The operators of the problems that are asked."""
+
+BUCKETS = ('small', 'large', 'negative')
+"""The operand sizes of the problems that are asked: operands up to 5, up to
+10, and problems with negative operands."""
+
+CATEGORIES = [(sign, bucket) for sign in OPERATORS for bucket in BUCKETS]
+"""Every category of problems, as tuples of an operator and a bucket."""
+
+TARGET = 0.75
+"""The expected score that problems are chosen for."""
+
+K = 32
+"""How far a single answer can move a rating."""
+
+FAST = 3.0
+"""Correct answers given within this many seconds count fully."""
+
+SLOW = 10.0
+"""Correct answers given after this many seconds only count half."""
+
+DECAY = 0.2
+"""How much each answer counts towards the average response time."""
+
+# The rating of each category, which the player's rating is measured
+# against. A new player is rated 1000 at everything, which puts small
+# additions right around the target.
+_DIFFICULTY = {'+': 0, '-': 100, '*': 250, '/': 350}
+_SIZE = {'small': 800, 'large': 1000, 'negative': 1150}
+
+
+def _bucket(a: int, b: int) -> str:
+    if a < 0 or b < 0:
+        return 'negative'
+    elif a <= 5 and b <= 5:
+        return 'small'
+    return 'large'
+
+
+def _sort_problems() -> dict[tuple[str, str], list[tuple[str, float]]]:
+    # The problems are the same as `arithmetic`'s hard problems, with
+    # operands from -10 to 10, sorted into categories.
+    problems = {category: [] for category in CATEGORIES}
+    texts, answers = arithmetic.get_problems("hard")
+    for text, answer in zip(texts.tolist(), answers.tolist()):
+        a, sign, b = text.split()
+        problems[sign, _bucket(int(a), int(b))].append((text, answer))
+    return problems
+
+
+# All problems in each category. These are sorted once, right away, since
+# problems are generated by the problem queue's thread as well as by the
+# main thread.
+_problems = _sort_problems()
+
+
+def get_key(category: tuple[str, str]) -> str:
+    """
+    Get the string that stands for a category, such as `+small`, which is
+    how categories are named in the user data and in the `problem_queue`.
+    """
+    return category[0] + category[1]
+
+
+def generate_problem(key: str) -> tuple[str, float]:
+    """
+    Generate a random problem of the category with the given key, as a tuple
+    of its string representation and its solution, just like
+    `arithmetic.generate_arithmetic()`.
+    """
+    return random.choice(_problems[key[:1], key[1:]])
+
+
+class Skill:
+    """
+    The player's skill at a single category of problems.
+    """
+    __slots__ = ('rating', 'latency', 'count')
+
+    def __init__(self, rating: float = 1000.0, latency: float = 0.0,
+                 count: int = 0):
+        self.rating = rating
+        """The Elo-style rating of the player at this category."""
+
+        self.latency = latency
+        """The exponentially decayed average time it took to answer, in
+        seconds."""
+
+        self.count = count
+        """The number of answers given."""
+
+
+class SkillModel:
+    """
+    A `SkillModel` holds the player's skill at every category of problems,
+    and chooses problems accordingly. Categories are tuples of an operator
+    from `OPERATORS` and a bucket from `BUCKETS`.
+    """
+
+    def __init__(self, rng: random.Random | None = None):
+        """
+        Construct a new model for a player that hasn't answered anything
+        yet. A random generator can be passed as `rng` to get reproducible
+        problems.
+        """
+        self._rng = rng if rng is not None else random.Random()
+        self._categories = CATEGORIES
+        self._index = {category: i
+                       for i, category in enumerate(self._categories)}
+        self._skills = [Skill() for _ in self._categories]
+        self._weights = [self._weigh(i) for i in range(len(self._skills))]
+
+    def _weigh(self, i: int) -> float:
+        # Categories right at the target are by far the most likely. Those
+        # that are too easy fall off quicker than those that are too hard,
+        # since ratings only go up where problems are asked, so they must
+        # not get stuck on what the player has already mastered. Every
+        # category keeps a small chance of being asked, too.
+        expected = self.get_expected(self._categories[i])
+        spread = 0.1 if expected > TARGET else 0.2
+        return math.exp(-((expected - TARGET) / spread) ** 2) + 0.02
+
+    def get_skill(self, category: tuple[str, str]) -> Skill:
+        """
+        Get the player's skill at the given category.
+        """
+        return self._skills[self._index[category]]
+
+    def get_expected(self, category: tuple[str, str]) -> float:
+        """
+        Get the score that the player is expected to get at the given
+        category, between 0 and 1.
+        """
+        sign, bucket = category
+        difficulty = _DIFFICULTY[sign] + _SIZE[bucket]
+        rating = self.get_skill(category).rating
+        return 1 / (1 + 10 ** ((difficulty - rating) / 400))
+
+    def choose(self) -> tuple[str, str]:
+        """
+        Choose the category of the next problem to ask.
+        """
+        return self._rng.choices(self._categories, self._weights)[0]
+
+    def generate(self) -> tuple[tuple[str, str], tuple[str, float]]:
+        """
+        Generate the next problem to ask. This returns its category, and the
+        problem itself, as a tuple whose first value is its string
+        representation, and whose second value is its solution, just like
+        `arithmetic.generate_arithmetic()`.
+        """
+        category = self.choose()
+        return category, self._rng.choice(_problems[category])
+
+    def record(self, category: tuple[str, str], correct: bool,
+               latency: float) -> None:
+        """
+        Record an answer to a problem of the given category, and whether it
+        was correct, `latency` seconds after the problem was asked.
+        """
+        i = self._index[category]
+        skill = self._skills[i]
+
+        if correct:
+            # Slow answers show that the player isn't quite there yet.
+            late = min(max(latency - FAST, 0) / (SLOW - FAST), 1)
+            score = 1 - late / 2
+        else:
+            score = 0
+        skill.rating += K * (score - self.get_expected(category))
+
+        if skill.count:
+            skill.latency += DECAY * (latency - skill.latency)
+        else:
+            skill.latency = latency
+        skill.count += 1
+        self._weights[i] = self._weigh(i)
+
+    def to_dict(self) -> dict:
+        """
+        Get the player's skills as a dictionary that can be stored as JSON.
+        Only categories that have been answered are included.
+        """
+        return {get_key(category): [round(skill.rating, 1),
+                                    round(skill.latency, 2), skill.count]
+                for category, skill in zip(self._categories, self._skills)
+                if skill.count}
+
+    @staticmethod
+    def from_dict(data: dict, rng: random.Random | None = None) \
+            -> 'SkillModel':
+        """
+        Construct a model from a dictionary returned by `to_dict()`. Anything
+        in it that isn't understood is ignored.
+        """
+        model = SkillModel(rng)
+        for key, values in data.items():
+            category = (key[:1], key[1:])
+            if category not in model._index:
+                continue
+            try:
+                rating, latency, count = values
+                skill = Skill(float(rating), float(latency), int(count))
+            except (TypeError, ValueError):
+                continue
+            i = model._index[category]
+            model._skills[i] = skill
+            model._weights[i] = model._weigh(i)
+        return model
@@ -0,0 +1,168 @@
+"""
+Answer matching as the player types. Waiting for the player to press Enter
+costs a keystroke, which at high speeds is often all the time there is to
+get over an obstacle, so the level checks the answer box after every single
+keystroke instead, and jumps as soon as it holds the right answer.
+
+To keep that cheap, the `AnswerMatcher` works out every way of writing the
+current answer that it accepts when the answer is set, and each keystroke is
+then a single set lookup. It also measures how long it takes from the
+keystroke that completes an answer until the character jumps.
+
+Note that you should use answer_matcher.get() to get the default instance of
+AnswerMatcher instead of instantiating it yourself.
+"""
+import collections
+import decimal
+import time
+from fractions import Fraction
+
+import log
+
+
+def _numeric_forms(answer: Fraction | float) -> set[str]:
+    value = Fraction(answer)
+    if value.denominator == 1:
+        forms = {str(value.numerator), f"{value.numerator}.0"}
+        if value == 0:
+            forms.add("-0")
+        return forms
+
+    forms = {f"{value.numerator}/{value.denominator}"}
+    # Fractions whose denominator has no prime factors other than 2 and 5
+    # can also be written out exactly as decimals.
+    denominator = value.denominator
+    for factor in (2, 5):
+        while denominator % factor == 0:
+            denominator //= factor
+    if denominator == 1:
+        with decimal.localcontext() as context:
+            context.prec = 100
+            text = str(decimal.Decimal(value.numerator)
+                       / decimal.Decimal(value.denominator))
+        forms.add(text)
+        if abs(value) < 1:
+            # Without the leading zero, like .5 or -.5
+            forms.add(text.replace("0.", ".", 1))
+    return forms
+
+
+class AnswerMatcher:
+    """
+    An `AnswerMatcher` holds the accepted forms of the answer to the current
+    question, and the keystroke-to-jump latencies measured so far.
+    """
+
+    def __init__(self, samples: int):
+        """
+        Construct a new answer matcher that keeps the given number of most
+        recent latency measurements.
+        """
+        self._forms = frozenset()
+        self._numeric = True
+        self._pressed = None
+        self._accepted = None
+        self._matches = 0
+        self._latencies = collections.deque(maxlen=samples)
+
+    def set_answer(self, answer: Fraction | float | str) -> None:
+        """
+        Set the answer to the current question. Numbers are accepted as
+        integers, fractions in lowest terms, and exact decimals, while text
+        is accepted regardless of case and surrounding whitespace.
+        """
+        if isinstance(answer, str):
+            self._numeric = False
+            self._forms = frozenset([answer.strip().lower()])
+        else:
+            self._numeric = True
+            self._forms = frozenset(_numeric_forms(answer))
+
+    def get_forms(self) -> frozenset[str]:
+        """
+        Get every form of the current answer that is accepted. A new set is
+        returned whenever the answer is set, even if the forms are the same.
+        """
+        return self._forms
+
+    def press(self) -> None:
+        """
+        Note that a key was just pressed. This should be called for every
+        key that is pressed while the player can type an answer.
+        """
+        self._pressed = time.perf_counter()
+
+    def accept(self) -> None:
+        """
+        Note that the last key pressed completed a correct answer, which
+        starts the measurement of how long it takes until the jump.
+        """
+        self._matches += 1
+        self._accepted = self._pressed
+
+    def match(self, text: str) -> bool:
+        """
+        Check whether `text`, the contents of the answer box after the last
+        keystroke, is one of the accepted forms of the answer, and accept it
+        if it is.
+        """
+        if self._numeric:
+            text = "".join(text.split())
+        else:
+            text = text.strip().lower()
+        if text not in self._forms:
+            return False
+        self.accept()
+        return True
+
+    def jumped(self) -> None:
+        """
+        Note that the character just jumped because of the accepted answer.
+        """
+        if self._accepted is not None:
+            self._latencies.append(time.perf_counter() - self._accepted)
+            self._accepted = None
+
+    def discard(self) -> None:
+        """
+        Stop measuring the accepted answer, because the character can't jump
+        right away, so the time until it does doesn't say anything about
+        how quickly answers are picked up.
+        """
+        self._accepted = None
+
+    def get_stats(self) -> dict:
+        """
+        Get statistics about the answers matched so far, with latencies in
+        milliseconds.
+        """
+        latencies = sorted(self._latencies)
+        stats = {'matches': self._matches, 'jumps': len(latencies)}
+        if latencies:
+            stats['latency_p50'] = latencies[len(latencies) // 2] * 1e3
+            stats['latency_max'] = latencies[-1] * 1e3
+        return stats
+
+    def log_stats(self) -> None:
+        """
+        Log statistics about the answers matched so far at the debug level.
+        """
+        stats = self.get_stats()
+        if not stats['jumps']:
+            return
+        log.msg(log.DEBUG,
+                f"Answers: {stats['matches']} matched, keystroke to jump "
+                f"p50={stats['latency_p50']:.3f}ms "
+                f"max={stats['latency_max']:.3f}ms")
+
+
+#  Construct a global, default answer matcher.
+_matcher = AnswerMatcher(256)
+
+
+def get() -> AnswerMatcher:
+    """
+    Get the global, default AnswerMatcher, which matches the answers typed
+    into the level.
+    """
+    return _matcher
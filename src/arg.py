@@ -7,31 +7,68 @@ ARG is a finite state machine; each "screen" that gets drawn to the pygame
 window is represented by its own state, which is responsible for drawing the
 game UI and moving components accordingly.
 """
+import argparse
+
 import pygame
 import pygame_gui
 import os
 import sys
-
+import time
+
+import answer_matcher
+import asset_cache
+import event_router
+import problem_queue
+import sound_bank
+import text_cache
 import user_data
 
+_REDRAW_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED,
+                  pygame.WINDOWSIZECHANGED)
+"""Events that indicate that the window contents were lost, so the current
+state handler must redraw the entire window even if it uses dirty
+rectangles."""
+
+_IDLE_TIMEOUT = 1000
+"""The longest time, in milliseconds, that the state machine loop sleeps
+while the current state handler is idle."""
+
 
-def load_asset(asset: str) -> pygame.Surface | pygame.SurfaceType:
+def load_asset(asset: str, size: tuple[int, int] | None = None,
+               alpha: bool = True) -> pygame.Surface | pygame.SurfaceType:
     """
     Load an asset by name from the default assets directory and return a
     Pygame surface which can be blitted to the main window as necessary.
     This function should be used instead of `pygame.image.load()` because all
     assets live in the same place, and if that place changes, then only this
     function has to be modified, not every single place an asset is used.
+
+    If `size` is given, the asset is scaled to that size. Assets are loaded
+    and scaled through the global `asset_cache`, so the returned surface is
+    shared with everything else that loaded the same asset at the same size,
+    and must not be drawn on. `alpha` should be `False` for assets that have
+    no transparency.
     """
-    path = os.path.join('assets', asset)
-    return pygame.image.load(path)
+    return asset_cache.get().load(asset, size, alpha)
 
 
-def main() -> None:
+def main(fps: int = 60, monitor=None, prewarm: bool = True) -> None:
     """
     The game entry function. All initial setup and final teardown
     happens here.
+
+    `fps` is the frame rate to which the state machine loop is capped; a
+    value of 0 doesn't cap the frame rate at all. The game itself is
+    simulated at a fixed rate, so this only changes how smooth the game
+    looks and how much power it uses, not how it plays.
+
+    `monitor` is an optional `game_state.LoopMonitor` that gets notified as
+    the state machine loop runs.
+
+    If `prewarm` is `False`, nothing is loaded ahead of time, and every
+    state handler is only constructed when its state is first entered.
     """
+    start_time = time.perf_counter()
 
     # Imports happen in main() to avoid circular imports, because some of the
     # other functions in here (load_asset()) are used by some of the imports
@@ -40,10 +77,11 @@ def main() -> None:
     # Not sure if this is the most Python-ic thing ever, but Python lets us, so
     # it must not be too bad, right?
     import log
-    from game_state import GameState, StateHandlerContext
+    from game_state import (GameState, StateHandlerContext, LoopMonitor,
+                            HandlerRegistry, GameClock, StateStack)
     from state.LevelEndHandler import LevelEndHandler
     from state.LevelPauseHandler import LevelPauseHandler
-    from state.LevelPlayHandler import LevelPlayHandler
+    from state.LevelPlayHandler import LevelPlayHandler, LevelResources
     from state.MainMenuHandler import MainMenuHandler
     from state.QuitHandler import QuitHandler
     from state.DifficultyHandler import DifficultyHandler
@@ -57,14 +95,28 @@ def main() -> None:
     pygame.init()
     pygame.font.init()
     path = os.path.join("music", "background_music.mp3")
-    pygame.mixer.music.load(path)
-    pygame.mixer.music.set_volume(0.2)
-    pygame.mixer.music.play(-1)
-
-    clock = pygame.time.Clock()  # keep track of time
+    try:
+        pygame.mixer.music.load(path)
+        pygame.mixer.music.set_volume(0.2)
+        pygame.mixer.music.play(-1)
+    except (pygame.error, FileNotFoundError):
+        # The game is perfectly playable without music, so there is no
+        # reason to crash just because it is missing.
+        log.msg(log.WARNING, f"Unable to play background music: {path}")
+
+    # Decode all sound effects up front so that playing them never stalls a
+    # frame.
+    sound_bank.get().preload(['jump.mp3', 'game_over.mp3'])
+    # Likewise, problems are generated in the background so that the level
+    # only has to pick them up.
+    problem_queue.get().start()
+
+    if monitor is None:
+        monitor = LoopMonitor()
+
+    clock = GameClock()  # keep track of time
 
     width, height = 900, 500
-    fps = 60  # frames per second
 
     # keeps track / creates of all gui components
     gui_manager = pygame_gui.UIManager((width, height))
@@ -73,32 +125,72 @@ def main() -> None:
     window = pygame.display.set_mode((width, height))
     pygame.display.set_caption("Arithman")  # set window title
 
+    # Now that the window exists, anything that was already loaded can be
+    # converted to the display format.
+    asset_cache.get().convert()
+    if prewarm:
+        # The level's images are by far the slowest to decode, so they are
+        # decoded in the background while the menus are up.
+        LevelResources.preload(width, height)
+
     prev_state = None
     state = GameState.MAIN_MENU  # Initial state
+    stack = StateStack(state)
+    # How the current state was entered: 'enter' for a regular state change,
+    # 'overlay' for an overlay that was pushed over the previous state, and
+    # 'resume' for a state that an overlay returned to.
+    transition = 'enter'
 
     # Initial context
-    context = StateHandlerContext(state, None, window, gui_manager, -1, {})
-
-    handlers = {
-        GameState.GAME_QUIT: QuitHandler(context),
-        GameState.MAIN_MENU: MainMenuHandler(context),
-        GameState.LEVEL_PLAY: LevelPlayHandler(context),
-        GameState.LEVEL_PAUSE: LevelPauseHandler(context),
-        GameState.LEVEL_END: LevelEndHandler(context),
-        GameState.DIFFICULTY: DifficultyHandler(context),
-        GameState.SCORE: ScoreHandler(context),
-        GameState.GAME_MODE: GameModeHandler(context),
-    }
+    context = StateHandlerContext(state, None, window, gui_manager, -1, {},
+                                  clock=clock)
+
+    # Handlers are only constructed when their state is first entered, so
+    # only the main menu has to be loaded before the first frame is shown.
+    handlers = HandlerRegistry({
+        GameState.GAME_QUIT: QuitHandler,
+        GameState.MAIN_MENU: MainMenuHandler,
+        GameState.LEVEL_PLAY: LevelPlayHandler,
+        GameState.LEVEL_PAUSE: LevelPauseHandler,
+        GameState.LEVEL_END: LevelEndHandler,
+        GameState.DIFFICULTY: DifficultyHandler,
+        GameState.SCORE: ScoreHandler,
+        GameState.GAME_MODE: GameModeHandler,
+    }, {
+        # The states that are most likely to be entered next, which are
+        # constructed ahead of time while the current state is idle. The
+        # level is only listed for the states that lead right into it,
+        # because it is the slowest to construct. The level itself is never
+        # idle, so the states that follow it are warmed up before it starts.
+        GameState.MAIN_MENU: [GameState.GAME_MODE, GameState.DIFFICULTY,
+                              GameState.SCORE],
+        GameState.GAME_MODE: [GameState.DIFFICULTY, GameState.LEVEL_PLAY,
+                              GameState.LEVEL_PAUSE, GameState.LEVEL_END],
+        GameState.DIFFICULTY: [GameState.LEVEL_PLAY, GameState.LEVEL_PAUSE,
+                               GameState.LEVEL_END],
+        GameState.SCORE: [GameState.GAME_MODE],
+    }, monitor, prewarm)
+    router = event_router.EventRouter()
+    first_frame = True
+    idle = False
 
     while state != GameState.GAME_QUIT:
-        # Tick the clock
-        time_delta = clock.tick(fps) / 1000
-
-        # Empty the pygame event queue
-        events = pygame.event.get()
-
-        # Clear last frame
-        window.fill('black')
+        monitor.begin_frame(state)
+
+        if idle:
+            # Nothing will change until something happens, so sleep until
+            # an event arrives instead of spinning at the full frame rate.
+            event = pygame.event.wait(_IDLE_TIMEOUT)
+            events = [] if event.type == pygame.NOEVENT else [event]
+            events += pygame.event.get()
+            time_delta = clock.tick()
+        else:
+            # Tick the clock. This is the only place where the game waits
+            # to keep its frame rate.
+            time_delta = clock.tick(fps)
+
+            # Empty the pygame event queue
+            events = pygame.event.get()
 
         # Invoke state handler to update state
         if state not in handlers:
@@ -107,24 +199,47 @@ def main() -> None:
                     f"This is a programming error.")
             state = GameState.GAME_QUIT
 
-        handler = handlers[state]
+        handler = handlers.get(state, context)
 
-        # Generate a new context with the current state, events, timing, and
-        # GUI components. We also copy over the previous context's storage so
-        # that state handlers can share data amongst themselves.
-        context = StateHandlerContext(state,
-                                      events,
-                                      window,
-                                      gui_manager,
-                                      time_delta,
-                                      context.get_storage())
+        # Only deliver the kinds of input events that the state handles.
+        if state != prev_state:
+            router.subscribe(handler.get_event_types())
+        events = router.route(events)
+
+        # State handlers that use dirty rectangles only redraw the whole
+        # window when they are first entered, or when the window contents
+        # were lost. Every other handler redraws the whole window every frame.
+        dirty_rects = handler.uses_dirty_rects()
+        redraw = (not dirty_rects or state != prev_state or
+                  any(event.type in _REDRAW_EVENTS for event in events))
+
+        # Clear last frame. Overlays are drawn over the last frame of the
+        # state they were entered from, so it is left alone for them.
+        if redraw and not (state != prev_state and transition == 'overlay'):
+            window.fill('black')
+
+        # Update the context with the current state, events, and timing.
+        # The same context, and thus the same storage, is used for the whole
+        # game, so that state handlers can share data amongst themselves.
+        context.begin_frame(state, events, time_delta, redraw)
 
         if state != prev_state:
-            log.msg(log.DEBUG, f"Entering state {state}.")
-            handler.on_enter(context)
+            clock.enter_state()
+            if transition == 'resume':
+                log.msg(log.DEBUG, f"Resuming state {state}.")
+                monitor.begin(state, 'on_resume')
+                handler.on_resume(context)
+                monitor.end(state, 'on_resume')
+            else:
+                log.msg(log.DEBUG, f"Entering state {state}.")
+                monitor.begin(state, 'on_enter')
+                handler.on_enter(context)
+                monitor.end(state, 'on_enter')
 
         prev_state = state
+        monitor.begin(prev_state, 'process')
         state = handler.process(context)
+        monitor.end(prev_state, 'process')
 
         for event in events:
             # log.msg(log.DEBUG, f"Received event: {event}")
@@ -137,21 +252,68 @@ def main() -> None:
             gui_manager.process_events(event)
 
         if state != prev_state:
-            log.msg(log.DEBUG, f"Leaving state {prev_state}.")
             # State handler on_exit() should know what the next state is,
             # so it may modify its behavior based on this.
-            #
-            # Yes, I know _state is private and we shouldn't be poking
-            # private variables! But the alternative is to create a new state
-            # context entirely, so this is just a shorthand that updates only
-            # the values necessary.
-            context._state = state
-            handler.on_exit(context)
+            context.set_state(state)
+
+            if state == stack.below():
+                # The overlay is done; go back to the state underneath it.
+                transition = 'resume'
+                stack.pop()
+                log.msg(log.DEBUG, f"Leaving state {prev_state}.")
+                monitor.begin(prev_state, 'on_exit')
+                handler.on_exit(context)
+                monitor.end(prev_state, 'on_exit')
+            elif (state in handlers
+                  and handlers.get(state, context).is_overlay()):
+                # Keep the current state around under the overlay.
+                transition = 'overlay'
+                stack.push(state)
+                log.msg(log.DEBUG, f"Suspending state {prev_state}.")
+                monitor.begin(prev_state, 'on_suspend')
+                handler.on_suspend(context)
+                monitor.end(prev_state, 'on_suspend')
+            else:
+                # Leave every active state, including any that are
+                # suspended under an overlay.
+                transition = 'enter'
+                for old_state in stack.replace(state):
+                    log.msg(log.DEBUG, f"Leaving state {old_state}.")
+                    monitor.begin(old_state, 'on_exit')
+                    handlers.get(old_state, context).on_exit(context)
+                    monitor.end(old_state, 'on_exit')
 
         gui_manager.update(time_delta)
         gui_manager.draw_ui(window)
 
-        pygame.display.update()  # updates screen
+        if redraw:
+            pygame.display.update()  # updates screen
+        else:
+            # Only push the regions the state handler actually changed.
+            pygame.display.update(context.get_dirty_rects())
+
+        monitor.end_frame(prev_state)
+
+        idle = False
+        if first_frame:
+            first_frame = False
+            elapsed = (time.perf_counter() - start_time) * 1000
+            log.msg(log.INFO, f"First frame presented after {elapsed:.1f}ms.")
+        elif state == prev_state and handler.is_idle(context):
+            # Nothing changed this frame, and nothing will until the user
+            # does something, so use the spare time to get the next state
+            # ready. Pre-warming never happens on a frame that already had
+            # to enter or exit a state, nor in states that need every frame,
+            # like the level. The loop only goes idle once there is nothing
+            # left to pre-warm.
+            idle = not handlers.prewarm(state, context)
+
+    for timed_state, seconds in handlers.get_timings().items():
+        log.msg(log.DEBUG, f"Constructed handler for state {timed_state} "
+                           f"in {seconds * 1000:.1f}ms.")
+    asset_cache.get().log_stats()
+    text_cache.get().log_stats()
+    answer_matcher.get().log_stats()
 
     pygame.quit()
     user_data.get().close()
@@ -162,4 +324,12 @@ if __name__ == "__main__":
     # reference parent modules cleanly. This happens here instead of main()
     # because it should always happen before any game logic occurs.
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-    main()
+
+    parser = argparse.ArgumentParser(description="Play Arithman.")
+    parser.add_argument('--fps', type=int, default=60,
+                        help="frame rate cap, such as 30 to save power or "
+                             "144 for fast displays; 0 means uncapped")
+    parser.add_argument('--no-prewarm', dest='prewarm', action='store_false',
+                        help="don't load anything ahead of time")
+    args = parser.parse_args()
+    main(args.fps, prewarm=args.prewarm)
@@ -1,9 +1,34 @@
 """
 Arithmetic prompt and answer handling.
+
+`generate_arithmetic()` makes one problem at a time for the game itself.
+`generate_batch()` makes any number of problems at once, for when a lot of
+them are needed, such as for practice worksheets. Every difficulty only has
+a few hundred distinct problems, so those are all enumerated once, and
+batches are drawn from them with NumPy instead of being built one by one.
 """
 
 import random
 
+import numpy
+
+_SIGNS = {
+    "easy": ("+", "-"),
+    "medium": ("+", "-", "*", "/"),
+    "hard": ("+", "-", "*", "/"),
+}
+"""The operators used at each difficulty."""
+
+_OPERANDS = {
+    "easy": range(0, 11),
+    "medium": range(0, 11),
+    "hard": range(-10, 11),
+}
+"""The numbers that each side of a problem can be at each difficulty."""
+
+# The problem space of each difficulty that has been enumerated so far.
+_spaces = {}
+
 
 def generate_arithmetic(mode: str) -> (str, float):
     """
@@ -18,28 +43,29 @@ def generate_arithmetic(mode: str) -> (str, float):
     for our purposes, we only need the display string for the equation and its
     solution.
     """
-    if mode.lower() == "easy":
+    mode = mode.lower()
+    if mode == "easy":
         sign = {0: "+", 1: "-"}
         random_sign = sign[random.randint(0, 1)]
-    elif mode.lower() == "medium" or mode.lower() == "hard":
+    elif mode == "medium" or mode == "hard":
         sign = {0: "+", 1: "-", 2: "*", 3: "/"}
         random_sign = sign[random.randint(0, 3)]
     else:
         raise AssertionError(f"Difficulty option not valid.")
     random_num_arth1 = random.randint(0, 10)
     random_num_arth2 = random.randint(0, 10)
-    if mode.lower() == "hard":
+    if mode == "hard":
         random_num_arth1 = random.randint(-10, 10)
         random_num_arth2 = random.randint(-10, 10)
     while random_sign == "/":
         while random_num_arth2 == 0:
-            if mode.lower() == "hard":
+            if mode == "hard":
                 random_num_arth2 = random.randint(-10, 10)
                 continue
             random_num_arth2 = random.randint(0, 10)
         if random_num_arth1 % random_num_arth2 == 0:
             break
-        if mode.lower() == "hard":
+        if mode == "hard":
             random_num_arth1 = random.randint(-10, 10)
             random_num_arth2 = random.randint(-10, 10)
             continue
@@ -63,3 +89,83 @@ def generate_arithmetic(mode: str) -> (str, float):
         float(answer)
     )
     return result
+
+
+def _solve(a: int, sign: str, b: int) -> float:
+    if sign == '+':
+        return float(a + b)
+    elif sign == '-':
+        return float(a - b)
+    elif sign == '*':
+        return float(a * b)
+    return a / b
+
+
+def _problem_space(mode: str) -> tuple:
+    # Every problem that generate_arithmetic() can make at a difficulty,
+    # grouped by operator. Division only includes the problems that divide
+    # evenly, which are exactly the ones its retry loop ends up with.
+    space = _spaces.get(mode)
+    if space is not None:
+        return space
+
+    problems = []
+    answers = []
+    starts = []
+    counts = []
+    for sign in _SIGNS[mode]:
+        starts.append(len(problems))
+        for a in _OPERANDS[mode]:
+            for b in _OPERANDS[mode]:
+                if sign == '/' and (b == 0 or a % b != 0):
+                    continue
+                problems.append(f"{a} {sign} {b}")
+                answers.append(_solve(a, sign, b))
+        counts.append(len(problems) - starts[-1])
+
+    space = (numpy.array(problems), numpy.array(answers),
+             numpy.array(starts), numpy.array(counts))
+    _spaces[mode] = space
+    return space
+
+
+def get_problems(mode: str) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Get every problem that `generate_arithmetic()` can make at a difficulty,
+    as two arrays, the first with the string representation of each
+    problem, and the second with their solutions. The arrays are shared, and
+    must not be modified.
+    """
+    mode = mode.lower()
+    if mode not in _SIGNS:
+        raise AssertionError(f"Difficulty option not valid.")
+    problems, answers, _, _ = _problem_space(mode)
+    return problems, answers
+
+
+def generate_batch(mode: str, n: int,
+                   rng: numpy.random.Generator | None = None) \
+        -> tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Generate `n` random arithmetic problems at once. This returns two arrays
+    of length `n`, the first with the string representation of each problem,
+    and the second with their solutions, which are the same as what
+    `generate_arithmetic()` would return for each of them. Problems are
+    drawn with the same odds as `generate_arithmetic()` too: every operator
+    is equally likely, and so is every problem for that operator.
+
+    A NumPy random generator can be passed as `rng` to get reproducible
+    batches.
+    """
+    mode = mode.lower()
+    if mode not in _SIGNS:
+        raise AssertionError(f"Difficulty option not valid.")
+    if rng is None:
+        rng = numpy.random.default_rng()
+
+    problems, answers, starts, counts = _problem_space(mode)
+    signs = rng.integers(0, len(starts), n)
+    # Scaling a uniform float picks a problem within each operator's group
+    # without a loop over the operators.
+    picks = starts[signs] + (rng.random(n) * counts[signs]).astype(numpy.intp)
+    return problems[picks], answers[picks]
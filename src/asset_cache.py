@@ -0,0 +1,186 @@
+"""
+A central cache for image assets. Every asset is loaded from the disk only
+once, no matter how many state handlers use it, and every scaled variant of
+an asset is only scaled once, no matter how many state handlers want it at
+that size.
+
+Once the game window exists, cached surfaces are also converted to the
+pixel format of the display, so that Pygame doesn't have to convert them
+every single time they are blitted.
+
+Decoding the larger assets takes long enough to freeze the game for a
+moment, so assets that will be needed soon can also be preloaded by a
+background thread with `preload()`.
+
+Note that you should use asset_cache.get() to get the default instance of
+AssetCache instead of instantiating it yourself. Also note that the surfaces
+handed out by the cache are shared, so they must never be drawn on.
+"""
+import os
+import threading
+
+import pygame
+
+import log
+
+
+class AssetCache:
+    """
+    AssetCache keeps every surface it loads, keyed by the asset name, the
+    size it was scaled to, and whether or not it has an alpha channel. It
+    also counts cache hits and misses, so that it is easy to see how much
+    work it is saving.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Construct a new asset cache that loads assets from the given
+        directory.
+        """
+        self._directory = directory
+        self._surfaces = {}
+        # Surfaces decoded by the preloading thread, which have yet to be
+        # converted to the display format by the main thread, and the keys
+        # that it has yet to get to. Both are shared with the thread, so
+        # they are only ever touched while holding the lock.
+        self._preloaded = {}
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _convert(surface: pygame.Surface, alpha: bool) -> pygame.Surface:
+        # Surfaces can only be converted to the display format once the
+        # display actually exists.
+        if pygame.display.get_surface() is None:
+            return surface
+        return surface.convert_alpha() if alpha else surface.convert()
+
+    def load(self, asset: str, size: tuple[int, int] | None = None,
+             alpha: bool = True) -> pygame.Surface:
+        """
+        Get the surface for an asset, loading it from the disk if it isn't
+        cached yet. If `size` is given, the surface is scaled to that size.
+        `alpha` should be `False` for assets without any transparency, such
+        as photos, because opaque surfaces are faster to blit.
+        """
+        key = (asset, size, alpha)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._hits += 1
+            return surface
+
+        self._misses += 1
+        with self._lock:
+            queued = key in self._queued
+        if queued and self._thread is not None:
+            # Decoding it again would only compete with the thread that is
+            # already doing it.
+            self._thread.join()
+        with self._lock:
+            surface = self._preloaded.pop(key, None)
+        if surface is not None:
+            surface = self._convert(surface, alpha)
+        elif size is None:
+            path = os.path.join(self._directory, asset)
+            surface = self._convert(pygame.image.load(path), alpha)
+        else:
+            # Scale from the original if it is cached anyway, but don't cache
+            # it just for this; some of the originals are huge compared to
+            # the size they are actually displayed at.
+            original = self._surfaces.get((asset, None, alpha))
+            if original is None:
+                path = os.path.join(self._directory, asset)
+                original = pygame.image.load(path)
+            surface = self._convert(pygame.transform.scale(original, size),
+                                    alpha)
+
+        self._surfaces[key] = surface
+        return surface
+
+    def preload(self, assets: list[tuple], background: bool = True) -> None:
+        """
+        Decode and scale the given assets ahead of time, so that loading
+        them later only has to convert them to the display format. Each
+        asset is a tuple of the arguments that will be passed to `load()`.
+        If `background` is `True`, the assets are decoded in a separate
+        thread so that the caller doesn't have to wait for them.
+        """
+        keys = [(asset, size, alpha) for asset, size, alpha in assets
+                if (asset, size, alpha) not in self._surfaces]
+        with self._lock:
+            self._queued.update(keys)
+
+        def load_all():
+            for key in keys:
+                asset, size, alpha = key
+                path = os.path.join(self._directory, asset)
+                try:
+                    surface = pygame.image.load(path)
+                    if size is not None:
+                        surface = pygame.transform.scale(surface, size)
+                except (pygame.error, FileNotFoundError):
+                    # load() will report it, if the asset is ever needed.
+                    surface = None
+                with self._lock:
+                    if surface is not None:
+                        self._preloaded[key] = surface
+                    self._queued.discard(key)
+
+        if background:
+            self._thread = threading.Thread(target=load_all, daemon=True)
+            self._thread.start()
+        else:
+            load_all()
+
+    def is_preloading(self) -> bool:
+        """
+        Check whether assets are still being preloaded in the background.
+        """
+        with self._lock:
+            return bool(self._queued)
+
+    def convert(self) -> None:
+        """
+        Convert all cached surfaces to the display format. This should be
+        called once the game window has been created, because assets loaded
+        before then could not be converted when they were loaded.
+        """
+        for key, surface in self._surfaces.items():
+            self._surfaces[key] = self._convert(surface, key[2])
+
+    def get_stats(self) -> dict:
+        """
+        Get the number of cache hits and misses so far, as well as how many
+        surfaces and how many bytes of pixel data the cache is holding.
+        """
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'surfaces': len(self._surfaces),
+            'bytes': sum(surface.get_pitch() * surface.get_height()
+                         for surface in self._surfaces.values()),
+        }
+
+    def log_stats(self) -> None:
+        """
+        Log the cache statistics at the debug level.
+        """
+        stats = self.get_stats()
+        log.msg(log.DEBUG,
+                f"{stats['hits']} hit(s), {stats['misses']} miss(es), "
+                f"{stats['surfaces']} surface(s), {stats['bytes']} byte(s).")
+
+
+# Construct a global, default asset cache.
+_cache = AssetCache('assets')
+
+
+def get() -> AssetCache:
+    """
+    Get the global, default AssetCache. All assets should be loaded through
+    this cache.
+    """
+    return _cache
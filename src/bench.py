@@ -0,0 +1,563 @@
+"""
+A headless benchmark for the game state machine. This module runs the real
+game loop from `arg.main()` using the SDL dummy video and audio drivers, and
+drives every state with synthetic events, so that it can run without a
+display and without any user input. Scores and everything else the game
+saves go to a temporary store that is removed afterwards, not to the
+player's own.
+
+While the game runs, the time taken by each state handler's `on_enter()`,
+`process()`, and `on_exit()` functions is recorded, as well as the total time
+taken by each frame. The results are summarized as percentiles and written to
+a JSON file, which can be compared against a previously stored baseline to
+catch frame time regressions.
+
+With `--allocations`, memory allocations and garbage collections are traced
+as well, to check that the loop doesn't allocate anything once it is running
+steadily. See `AllocationMonitor` for details.
+
+This module should be run from the root of the repository, just like the
+game itself:
+
+    python src/bench.py --frames 120 --output bench.json \\
+        --baseline bench_baseline.json
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# The dummy drivers must be selected before Pygame is initialized.
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+import pygame  # noqa: E402
+
+import answer_matcher  # noqa: E402
+from game_state import GameState, LoopMonitor  # noqa: E402
+
+_WAKE = pygame.event.custom_type()
+"""A custom event posted every frame so that idle states never make the
+benchmark wait. Custom events are always delivered."""
+
+STATE_NAMES = {value: name for name, value in vars(GameState).items()
+               if name.isupper()}
+"""Maps each `GameState` value to its name, which is used in the report."""
+
+
+def _click(x: int, y: int) -> list[pygame.event.Event]:
+    """
+    Generate the events that make up a mouse click at the given position.
+    """
+    return [
+        pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(x, y), button=1),
+        pygame.event.Event(pygame.MOUSEBUTTONUP, pos=(x, y), button=1),
+    ]
+
+
+def _type(text: str) -> list[pygame.event.Event]:
+    """
+    Generate the events that make up typing the given text.
+    """
+    events = []
+    for char in text:
+        events.append(pygame.event.Event(
+            pygame.KEYDOWN, key=ord(char), mod=0, unicode=char, scancode=0))
+        events.append(pygame.event.Event(pygame.TEXTINPUT, text=char))
+    return events
+
+
+def _key(key: int) -> list[pygame.event.Event]:
+    """
+    Generate the events that make up a key press of the given key.
+    """
+    return [
+        pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode=''),
+        pygame.event.Event(pygame.KEYUP, key=key, mod=0, unicode=''),
+    ]
+
+
+ANSWER = 'answer'
+"""Used in place of the events of a `ROUTE` entry to answer every question
+as soon as it is asked, while waiting for the state to end on its own."""
+
+ROUTE = [
+    (GameState.MAIN_MENU, _click(450, 350)),  # SCORE
+    (GameState.SCORE, _click(450, 395)),  # BACK
+    (GameState.MAIN_MENU, _click(225, 350)),  # START
+    (GameState.GAME_MODE, _click(325, 350)),  # MATH
+    (GameState.DIFFICULTY, _click(225, 350)),  # EASY
+    (GameState.LEVEL_PLAY, _key(pygame.K_SPACE)),  # Pause
+    (GameState.LEVEL_PAUSE, _click(225, 350)),  # RESUME
+    # No answer is ever given, so the character eventually runs into the
+    # obstacle and the level ends on its own.
+    (GameState.LEVEL_PLAY, None),
+    (GameState.LEVEL_END, _click(450, 350)),  # BACK
+    (GameState.MAIN_MENU, _click(225, 350)),  # START
+    (GameState.GAME_MODE, _click(325, 350)),  # MATH
+    (GameState.DIFFICULTY, _click(675, 350)),  # HARD
+    # Every question is answered, so the character keeps jumping over the
+    # obstacles, which come closest together in hard mode, until the end
+    # of the level is reached.
+    (GameState.LEVEL_PLAY, ANSWER),
+    (GameState.LEVEL_END, _click(450, 350)),  # BACK
+    (GameState.MAIN_MENU, [pygame.event.Event(pygame.QUIT)]),
+]
+"""The path taken through the state machine during a benchmark run. Each
+entry is a state and the events that are posted after that state has been
+processed for the requested number of frames. If the events are `None` or
+`ANSWER`, nothing is posted, except for answers with `ANSWER`, and the
+benchmark moves on to the next entry as soon as the state changes on its
+own, however many frames that takes."""
+
+
+def _summarize(samples: list[int], scale: float = 1e6) -> dict:
+    """
+    Summarize a list of timing samples, in nanoseconds, as a dictionary of
+    statistics, in milliseconds. Other kinds of samples can be summarized by
+    passing a different `scale` to divide them by, such as 1 to keep them
+    as they are.
+    """
+    ordered = sorted(samples)
+    count = len(ordered)
+
+    def percentile(p):
+        return ordered[min(count - 1, int(count * p / 100))] / scale
+
+    return {
+        'count': count,
+        'mean': sum(ordered) / count / scale,
+        'p50': percentile(50),
+        'p95': percentile(95),
+        'p99': percentile(99),
+        'max': ordered[-1] / scale,
+    }
+
+
+class BenchmarkMonitor(LoopMonitor):
+    """
+    A `LoopMonitor` that follows `ROUTE` through the state machine by posting
+    synthetic events, timing every state handler invocation along the way.
+    """
+
+    def __init__(self, frames: int, timeout: float):
+        """
+        Create a new benchmark monitor that keeps each state on the route for
+        `frames` frames. If the route hasn't been completed after `timeout`
+        seconds, the game is told to quit and the benchmark is marked as
+        timed out.
+        """
+        self._frames = frames
+        self._timeout = timeout
+        self._timed_out = False
+        self._step = 0
+        self._state = None
+        self._state_frames = 0
+        self._total_frames = 0
+        self._started = {}
+        self._frame_start = 0
+        self._samples = {}
+        self._complete = False
+        self._waiting = False
+        self._created = time.perf_counter_ns()
+        self._deadline = self._created + int(timeout * 1e9)
+        self._first_frame = None
+        self._forms = None
+
+    def _record(self, state: GameState, phase: str, sample: int) -> None:
+        name = STATE_NAMES.get(state, str(state))
+        self._samples.setdefault(name, {}).setdefault(phase, []).append(
+            sample)
+
+    def begin_frame(self, state: GameState) -> None:
+        if state != self._state:
+            self._state = state
+            self._state_frames = 0
+
+        self._state_frames += 1
+        self._total_frames += 1
+
+        # Keep the event processing code busy with some mouse motion, just
+        # like a real user would. States that don't handle it won't get it,
+        # so wake the loop up separately.
+        pos = (self._total_frames % 900, self._total_frames % 500)
+        for i in range(4):
+            pygame.event.post(
+                pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(1, 1),
+                                   buttons=(0, 0, 0)))
+        pygame.event.post(pygame.event.Event(_WAKE))
+
+        if self._step < len(ROUTE) and ROUTE[self._step][1] in (None,
+                                                                ANSWER):
+            # Waiting for the state to end on its own. Once it has, the next
+            # entry starts counting frames in the new state.
+            route_state, events = ROUTE[self._step]
+            if state != route_state and self._waiting:
+                self._step += 1
+                self._complete = self._step == len(ROUTE)
+            self._waiting = state == route_state
+            forms = answer_matcher.get().get_forms()
+            if events == ANSWER and self._waiting and forms is not self._forms:
+                # A new question was asked. The answer only has to be typed
+                # once; the character jumps when the obstacle comes close.
+                self._forms = forms
+                for event in _type(min(forms, key=len)):
+                    pygame.event.post(event)
+
+        if not self._complete and time.perf_counter_ns() > self._deadline:
+            if not self._timed_out:
+                self._timed_out = True
+                pygame.event.post(pygame.event.Event(pygame.QUIT))
+        elif self._step < len(ROUTE):
+            route_state, events = ROUTE[self._step]
+            if (events not in (None, ANSWER) and state == route_state
+                    and self._state_frames >= self._frames):
+                self._step += 1
+                self._complete = self._step == len(ROUTE)
+                for event in events:
+                    pygame.event.post(event)
+
+        self._frame_start = time.perf_counter_ns()
+
+    def begin(self, state: GameState, phase: str) -> None:
+        self._started[phase] = time.perf_counter_ns()
+
+    def end(self, state: GameState, phase: str) -> None:
+        self._record(state, phase,
+                     time.perf_counter_ns() - self._started[phase])
+
+    def end_frame(self, state: GameState) -> None:
+        now = time.perf_counter_ns()
+        self._record(state, 'frame', now - self._frame_start)
+        if self._first_frame is None:
+            # This includes all of the game's startup, which is what users
+            # actually wait for.
+            self._first_frame = (now - self._created) / 1e6
+
+    def report(self) -> dict:
+        """
+        Summarize all of the recorded samples into a dictionary that can be
+        serialized as JSON.
+        """
+        return {
+            'frames': self._frames,
+            'total_frames': self._total_frames,
+            'complete': self._complete,
+            'timed_out': self._timed_out,
+            'step': self._step,
+            'first_frame': self._first_frame,
+            'handlers': {
+                name: {phase: _summarize(samples)
+                       for phase, samples in phases.items()}
+                for name, phases in self._samples.items()
+            }
+        }
+
+
+class AllocationMonitor(BenchmarkMonitor):
+    """
+    A `BenchmarkMonitor` that also traces memory allocations with
+    `tracemalloc`, and garbage collections with `gc.callbacks`, and
+    attributes both to the frames and state handler functions they happen
+    in. For each of those, it records:
+
+    - `blocks`: The net number of memory blocks allocated, which is what
+    makes the garbage collector run. In the steady state, this should be 0.
+    - `bytes`: The net number of bytes allocated.
+    - `peak`: The most bytes that were allocated at any point while a state
+    handler function ran, even if they were freed again. This isn't
+    recorded for frames.
+    - Every garbage collection, by generation, and how long it took.
+
+    Whatever the monitor allocates itself is left out, as far as possible.
+    Tracing allocations makes everything a lot slower, so the timings that
+    this monitor records must never be compared to timings recorded without
+    it.
+    """
+
+    def __init__(self, frames: int, timeout: float):
+        super().__init__(frames, timeout)
+        self._allocations = {}
+        self._collections = {}
+        self._phase = None
+        self._outer_phase = None
+        self._phase_mark = None
+        self._frame_mark = None
+        self._overhead = [0, 0]
+        self._gc_start = 0
+        self._bias = {'phase': (0, 0), 'frame': (0, 0)}
+        tracemalloc.start()
+        self._calibrate()
+        gc.callbacks.append(self._on_gc)
+
+    @staticmethod
+    def _mark() -> tuple[int, int]:
+        return sys.getallocatedblocks(), tracemalloc.get_traced_memory()[0]
+
+    def _calibrate(self) -> None:
+        # Measuring allocates a few blocks itself, which always adds the
+        # same amount to each measurement. Measure empty phases and frames
+        # to find out how much that is, so that it can be subtracted.
+        for _ in range(32):
+            self._begin_frame()
+            self.begin(None, 'calibrate')
+            self.end(None, 'calibrate')
+            self._end_frame(None)
+
+        name = STATE_NAMES.get(None, str(None))
+        samples = self._allocations.pop(name)
+        self._samples.pop(name)
+        for kind in ('phase', 'frame'):
+            key = 'calibrate' if kind == 'phase' else 'frame'
+            blocks = sorted(samples[key]['blocks'])
+            size = sorted(samples[key]['bytes'])
+            self._bias[kind] = (blocks[len(blocks) // 2],
+                                size[len(size) // 2])
+        self._phase = None
+
+    def _record_allocations(self, state: GameState, phase: str,
+                            start: tuple[int, int], end: tuple[int, int],
+                            peak: int | None) -> None:
+        bias = self._bias['frame' if peak is None else 'phase']
+        name = STATE_NAMES.get(state, str(state))
+        samples = self._allocations.setdefault(name, {}).setdefault(
+            phase, {'blocks': [], 'bytes': [], 'peak': []})
+        samples['blocks'].append(end[0] - start[0] - bias[0])
+        samples['bytes'].append(end[1] - start[1] - bias[1])
+        if peak is not None:
+            samples['peak'].append(peak - start[1])
+
+    def _on_gc(self, gc_phase: str, info: dict) -> None:
+        if gc_phase == 'start':
+            self._gc_start = time.perf_counter_ns()
+            return
+        if self._phase is None:
+            return
+        state, phase = self._phase
+        name = STATE_NAMES.get(state, str(state))
+        stats = self._collections.setdefault(name, {}).setdefault(
+            phase, {'generations': [0, 0, 0], 'pauses': []})
+        stats['generations'][info['generation']] += 1
+        stats['pauses'].append(time.perf_counter_ns() - self._gc_start)
+
+    def _exclude(self, start: tuple[int, int]) -> None:
+        # Whatever this monitor allocates while recording a phase must not
+        # count towards the frame that the phase is part of.
+        end = self._mark()
+        self._overhead[0] += end[0] - start[0]
+        self._overhead[1] += end[1] - start[1]
+
+    def _begin_frame(self) -> None:
+        self._overhead[0] = self._overhead[1] = 0
+        self._frame_mark = self._mark()
+
+    def _end_frame(self, state: GameState) -> None:
+        end = self._mark()
+        end = (end[0] - self._overhead[0], end[1] - self._overhead[1])
+        self._record_allocations(state, 'frame', self._frame_mark, end,
+                                 None)
+
+    def begin_frame(self, state: GameState) -> None:
+        super().begin_frame(state)
+        self._phase = (state, 'frame')
+        self._begin_frame()
+
+    def begin(self, state: GameState, phase: str) -> None:
+        start = self._mark()
+        super().begin(state, phase)
+        # Handlers can be constructed between frames, too.
+        self._outer_phase = self._phase
+        self._phase = (state, phase)
+        tracemalloc.reset_peak()
+        self._exclude(start)
+        self._phase_mark = self._mark()
+
+    def end(self, state: GameState, phase: str) -> None:
+        end = self._mark()
+        peak = tracemalloc.get_traced_memory()[1]
+        self._record_allocations(state, phase, self._phase_mark, end, peak)
+        self._phase = self._outer_phase
+        super().end(state, phase)
+        self._exclude(end)
+
+    def end_frame(self, state: GameState) -> None:
+        self._end_frame(state)
+        self._phase = None
+        super().end_frame(state)
+
+    def stop(self) -> None:
+        """
+        Stop tracing allocations and garbage collections.
+        """
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        tracemalloc.stop()
+
+    def report(self) -> dict:
+        report = super().report()
+        report['allocations'] = {
+            name: {
+                phase: {kind: _summarize(values, 1)
+                        for kind, values in samples.items() if values}
+                for phase, samples in phases.items()
+            }
+            for name, phases in self._allocations.items()
+        }
+        report['collections'] = {
+            name: {
+                phase: {
+                    'generations': stats['generations'],
+                    'pause': _summarize(stats['pauses']),
+                }
+                for phase, stats in phases.items()
+            }
+            for name, phases in self._collections.items()
+        }
+        return report
+
+
+def compare(report: dict, baseline: dict, tolerance: float,
+            slack: float) -> list[str]:
+    """
+    Compare the p95 timings of a benchmark report against a baseline report.
+    A timing regresses if it is more than `tolerance` (a fraction) slower
+    than the baseline, and also more than `slack` milliseconds slower, so
+    that noise in very fast functions doesn't get reported. A description of
+    each regression is returned.
+    """
+    regressions = []
+    if report['first_frame'] > baseline['first_frame'] * (1 + tolerance):
+        regressions.append(
+            f"first frame: {report['first_frame']:.3f}ms, "
+            f"baseline {baseline['first_frame']:.3f}ms")
+    for name, phases in report['handlers'].items():
+        for phase, stats in phases.items():
+            base = baseline['handlers'].get(name, {}).get(phase)
+            if base is None:
+                continue
+            if (stats['p95'] > base['p95'] * (1 + tolerance) and
+                    stats['p95'] - base['p95'] > slack):
+                regressions.append(
+                    f"{name}.{phase}: p95 {stats['p95']:.3f}ms, "
+                    f"baseline {base['p95']:.3f}ms")
+    return regressions
+
+
+def main() -> int:
+    """
+    The benchmark entry function. Returns the process exit status, which is
+    non-zero if the benchmark didn't complete or a regression was found.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--frames', type=int, default=120,
+                        help='frames to spend in each state on the route')
+    parser.add_argument('--timeout', type=float, default=300,
+                        help='seconds after which an unfinished run is '
+                             'stopped')
+    parser.add_argument('--fps', type=int, default=0,
+                        help='frame rate cap; 0 runs as fast as possible')
+    parser.add_argument('--output', default='bench.json',
+                        help='file to write the JSON report to')
+    parser.add_argument('--baseline',
+                        help='JSON report to compare the results against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed fractional p95 slowdown')
+    parser.add_argument('--slack', type=float, default=0.05,
+                        help='allowed absolute p95 slowdown in ms')
+    parser.add_argument('--no-prewarm', dest='prewarm', action='store_false',
+                        help="don't load anything ahead of time, so that "
+                             "every handler is constructed on demand")
+    parser.add_argument('--allocations', action='store_true',
+                        help='also trace allocations and garbage '
+                             'collections; timings are much slower')
+    args = parser.parse_args()
+
+    # The game keeps scores and skill ratings in the default user data
+    # store, which is opened as soon as `user_data` is imported. The
+    # benchmark plays through whole levels, so that store is moved to a
+    # temporary directory first, where it can't touch a real player's data.
+    data_dir = tempfile.TemporaryDirectory(prefix='arg-bench-')
+    os.environ['XDG_DATA_HOME'] = data_dir.name
+    os.environ['APPDATA'] = data_dir.name
+    if sys.platform == 'darwin':
+        os.environ['HOME'] = data_dir.name
+
+    import arg
+    import asset_cache
+    import log
+    import text_cache
+
+    if args.allocations:
+        monitor = AllocationMonitor(args.frames, args.timeout)
+    else:
+        monitor = BenchmarkMonitor(args.frames, args.timeout)
+    try:
+        arg.main(args.fps, monitor, args.prewarm)
+    finally:
+        data_dir.cleanup()
+    log.get_logger().set_level(log.INFO)
+    if args.allocations:
+        monitor.stop()
+
+    report = monitor.report()
+    report['assets'] = asset_cache.get().get_stats()
+    report['text'] = text_cache.get().get_stats()
+    report['answers'] = answer_matcher.get().get_stats()
+    report['prewarm'] = args.prewarm
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    log.msg(log.INFO, f"First frame: {report['first_frame']:.3f}ms")
+    for name, phases in report['handlers'].items():
+        for phase, stats in phases.items():
+            log.msg(log.INFO,
+                    f"{name}.{phase}: n={stats['count']} "
+                    f"p50={stats['p50']:.3f}ms p95={stats['p95']:.3f}ms "
+                    f"p99={stats['p99']:.3f}ms")
+    for name, phases in report.get('allocations', {}).items():
+        for phase, kinds in phases.items():
+            blocks = kinds['blocks']
+            log.msg(log.INFO,
+                    f"{name}.{phase}: blocks p50={blocks['p50']:.0f} "
+                    f"p95={blocks['p95']:.0f} "
+                    f"total={blocks['mean'] * blocks['count']:.0f}, "
+                    f"bytes p50={kinds['bytes']['p50']:.0f}")
+    for name, phases in report.get('collections', {}).items():
+        for phase, stats in phases.items():
+            log.msg(log.INFO,
+                    f"{name}.{phase}: collections "
+                    f"{'/'.join(map(str, stats['generations']))}, "
+                    f"max pause {stats['pause']['max']:.3f}ms")
+
+    if report['timed_out']:
+        state = STATE_NAMES[ROUTE[report['step']][0]]
+        log.msg(log.ERROR,
+                f"Benchmark timed out after {args.timeout:g}s, waiting for "
+                f"{state} at step {report['step'] + 1} of {len(ROUTE)}.")
+        return 1
+    if not report['complete']:
+        log.msg(log.ERROR, "Benchmark route did not complete.")
+        return 1
+
+    if args.baseline and args.allocations:
+        log.msg(log.WARNING, "Not comparing timings against the baseline, "
+                             "because allocations were traced.")
+    elif args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.tolerance, args.slack)
+        for regression in regressions:
+            log.msg(log.ERROR, f"Regression: {regression}")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    sys.exit(main())
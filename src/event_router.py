@@ -0,0 +1,95 @@
+"""
+Routing of Pygame events to the current state. Most screens only care about
+one or two kinds of events, such as mouse clicks, but every event that the
+user generates is put on the event queue, and every event on the queue has
+to be looked at by the state machine loop. Moving the mouse alone can easily
+generate dozens of events per frame.
+
+The `EventRouter` lets the current state subscribe to only the kinds of
+input events it actually handles. Pygame is told to block all other input
+events, so that they never even make it onto the queue, and whatever does
+make it onto the queue is filtered down to what the state subscribed to,
+with runs of mouse motion merged into a single event.
+
+Events that aren't user input, such as quitting, window events, and custom
+events like timers and Pygame GUI events, are always delivered.
+"""
+import pygame
+
+INPUT_TYPES = (
+    pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP,
+    pygame.MOUSEWHEEL, pygame.KEYDOWN, pygame.KEYUP, pygame.TEXTINPUT,
+    pygame.TEXTEDITING, pygame.FINGERDOWN, pygame.FINGERUP,
+    pygame.FINGERMOTION, pygame.JOYAXISMOTION, pygame.JOYBALLMOTION,
+    pygame.JOYHATMOTION, pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP,
+)
+"""The user input event types that states can subscribe to. All other event
+types are always delivered."""
+
+
+class EventRouter:
+    """
+    An `EventRouter` holds the input event types that the current state
+    subscribed to, and routes events accordingly.
+    """
+
+    def __init__(self):
+        self._types = None
+        self._routed = []
+
+    def subscribe(self, types: tuple[int] | None) -> None:
+        """
+        Subscribe to the given input event types, replacing the previous
+        subscription. This should be done whenever a new state is entered.
+        `None` subscribes to all events, which is what states that use
+        Pygame GUI components need, because those handle all kinds of input
+        on their own.
+        """
+        if types is None:
+            self._types = None
+            pygame.event.set_allowed(None)
+            return
+
+        self._types = frozenset(types)
+        allowed = [t for t in INPUT_TYPES if t in self._types]
+        blocked = [t for t in INPUT_TYPES if t not in self._types]
+        if allowed:
+            pygame.event.set_allowed(allowed)
+        if blocked:
+            pygame.event.set_blocked(blocked)
+
+    def get_types(self) -> frozenset[int] | None:
+        """
+        Get the input event types subscribed to, or `None` if all events are
+        subscribed to.
+        """
+        return self._types
+
+    def route(self, events: list[pygame.event.Event]) \
+            -> list[pygame.event.Event]:
+        """
+        Get the events that should be delivered to the current state, in the
+        order they happened. Input events that aren't subscribed to are
+        dropped, and back-to-back mouse motion events are merged into one.
+        The returned list is reused by the next call, so it must not be kept
+        around.
+        """
+        routed = self._routed
+        routed.clear()
+        for event in events:
+            if (self._types is not None and event.type in INPUT_TYPES
+                    and event.type not in self._types):
+                continue
+
+            if (event.type == pygame.MOUSEMOTION and routed
+                    and routed[-1].type == pygame.MOUSEMOTION):
+                # The last event of a run of motion stands for all of it.
+                # The movement of the ones before it is added into it, which
+                # only replaces a tuple, where merging them into a new event
+                # would have to copy the whole event.
+                rel = routed[-1].rel
+                event.rel = (rel[0] + event.rel[0], rel[1] + event.rel[1])
+                routed[-1] = event
+            else:
+                routed.append(event)
+        return routed
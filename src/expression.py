@@ -0,0 +1,155 @@
+"""
+Arithmetic expressions with more than one operator, and exact answers.
+
+`arithmetic.generate_arithmetic()` only asks `a op b` with small operands.
+An `ExpressionGenerator` asks expressions with any number of operands in any
+range, mixing operators, with parentheses wherever precedence needs them.
+Answers are `fractions.Fraction`s, so that dividing never loses anything to
+rounding, and answers typed in by the player, such as `3/4`, are parsed and
+compared exactly by `parse_answer()` and `check_answer()`.
+
+Every possible shape of expression is turned into a template once, when the
+generator is constructed: a format string to display it, and a compiled
+function to solve it. Generating a problem then only means picking a
+template and its operands, which takes the same time no matter how large the
+operands are or how many templates there are.
+"""
+import random
+from fractions import Fraction
+
+PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2}
+"""How tightly each operator binds. Operators that bind tighter are applied
+first."""
+
+
+def _div(a, b) -> Fraction:
+    # Division of integers would give a float, so it is done with fractions.
+    return Fraction(a, b)
+
+
+def _trees(n: int, operators: str):
+    # Every expression tree with `n` operands, with every assignment of
+    # operators to its nodes. Operands are `None`, and nodes are tuples of
+    # the operator and the left and right subtrees.
+    if n == 1:
+        yield None
+        return
+    for k in range(1, n):
+        for left in _trees(k, operators):
+            for right in _trees(n - k, operators):
+                for operator in operators:
+                    yield operator, left, right
+
+
+def _render(tree, operands: list[str]) -> tuple[str, str, int]:
+    # The display format, the Python code, and the precedence of a tree.
+    # `operands` holds the names of the operands that haven't been used yet.
+    if tree is None:
+        i = len(operands) - 1
+        operands.pop()
+        return f"{{{i}}}", f"a{i}", 3
+
+    operator, left, right = tree
+    # Operands are numbered from the right, so the right side comes first.
+    right_text, right_code, right_precedence = _render(right, operands)
+    left_text, left_code, left_precedence = _render(left, operands)
+    precedence = PRECEDENCE[operator]
+    if left_precedence < precedence:
+        left_text = f"({left_text})"
+    # Operators are left-associative, so the right side needs parentheses
+    # even if it binds just as tightly.
+    if right_precedence <= precedence:
+        right_text = f"({right_text})"
+
+    text = f"{left_text} {operator} {right_text}"
+    if operator == '/':
+        code = f"_div({left_code}, {right_code})"
+    else:
+        code = f"({left_code} {operator} {right_code})"
+    return text, code, precedence
+
+
+class ExpressionGenerator:
+    """
+    An `ExpressionGenerator` generates random expressions from a fixed set
+    of operators, with a number of operands in a given range, and operands
+    between given bounds.
+    """
+
+    def __init__(self, low: int = -10, high: int = 10,
+                 operators: str = "+-*/", operands: tuple[int, int] = (2, 3),
+                 parentheses: bool = True, rng: random.Random | None = None):
+        """
+        Construct a new expression generator, with operands from `low` to
+        `high`, inclusive, and from `operands[0]` to `operands[1]` operands
+        in each expression. If `parentheses` is `False`, only expressions
+        that can be written without parentheses are generated. A random
+        generator can be passed as `rng` to get reproducible expressions.
+        """
+        if not operators or operands[0] < 1 or operands[0] > operands[1]:
+            raise ValueError("No expressions can be generated.")
+
+        self._low = low
+        self._high = high
+        self._rng = rng if rng is not None else random.Random()
+
+        # Templates are grouped by their number of operands, so that every
+        # number is equally likely, even though longer expressions can take
+        # many more shapes.
+        self._groups = []
+        for n in range(operands[0], operands[1] + 1):
+            names = [f"a{i}" for i in range(n)]
+            templates = []
+            for tree in _trees(n, operators):
+                text, code, _ = _render(tree, list(names))
+                if not parentheses and '(' in text:
+                    continue
+                solve = eval(f"lambda {', '.join(names)}: {code}",
+                             {'_div': _div})
+                templates.append((text, solve, n))
+            if templates:
+                self._groups.append(templates)
+
+    def __len__(self) -> int:
+        """
+        Get the number of templates that expressions are generated from.
+        """
+        return sum(len(templates) for templates in self._groups)
+
+    def generate(self) -> tuple[str, Fraction]:
+        """
+        Generate a random expression. This returns a tuple whose first value
+        is the string representation of the expression, and whose second
+        value is its exact value.
+        """
+        rng = self._rng
+        while True:
+            text, solve, n = rng.choice(rng.choice(self._groups))
+            operands = [rng.randint(self._low, self._high) for _ in range(n)]
+            try:
+                return text.format(*operands), Fraction(solve(*operands))
+            except ZeroDivisionError:
+                # Only expressions that divide by something that comes out
+                # to zero get here, so retrying rarely takes more than once.
+                continue
+
+
+def parse_answer(text: str) -> Fraction | None:
+    """
+    Parse an answer typed in by the player, which can be an integer, a
+    decimal, or a fraction such as `3/4` or `-3 / 4`. Returns `None` if it
+    isn't a number.
+    """
+    try:
+        return Fraction("".join(text.split()))
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def check_answer(text: str, answer: Fraction | float) -> bool:
+    """
+    Check whether an answer typed in by the player is exactly the given
+    answer.
+    """
+    value = parse_answer(text)
+    return value is not None and value == answer
@@ -4,13 +4,25 @@ The game state machine requires a number of components to be useful:
 - `GameState`: An enumeration of all the possible game states. This enumeration
 is used by the main event loop to keep track of which state handler to invoke,
 as well as by the state handlers themselves to signal state transitions.
+- `GameClock`: The one and only clock that keeps time for the state machine,
+which knows how much time has passed in total, in the game, and in the current
+state.
 - `StateHandlerContext`: A simple data object that stores the game context,
 which is passed to each state handler function when it is being invoked.
 - `StateHandler`: A simple interface that implements a state handler. State
 handlers are expected to adhere to this interface, and may implement any or no
 functions. Note that they should always call their parent functions listed
 in the interface, because these parent functions perform useful logic.
+- `StateStack`: The stack of states that are active at the same time, which
+is how overlay states, such as the pause screen, are drawn over other states
+without ending them.
+- `LoopMonitor`: An interface for observing the state machine loop, which is
+used for instrumentation.
+- `HandlerRegistry`: Maps each game state to its state handler, constructing
+the handlers on demand.
 """
+import time
+
 import pygame
 import pygame_gui
 
@@ -49,6 +61,109 @@ class GameState:
     select between math and flashcard mode."""
 
 
+class GameClock:
+    """
+    The game clock keeps three kinds of time, all in seconds:
+
+    - Wall time, which is all the time that has passed since the clock was
+    created.
+    - Game time, which is like wall time, except that it stands still while
+    the clock is paused, such as while a level is paused.
+    - State time, which is the wall time that has passed since the current
+    state was entered.
+
+    The clock is ticked exactly once per frame by the state machine loop,
+    which is the only place where the game ever waits to cap its frame rate.
+    State handlers must never tick it themselves; they get it from
+    `StateHandlerContext.get_clock()` to read the time.
+    """
+
+    def __init__(self):
+        self._clock = pygame.time.Clock()
+        self._last = time.perf_counter()
+        self._delta = 0.0
+        self._wall_time = 0.0
+        self._game_time = 0.0
+        self._state_time = 0.0
+        self._paused = False
+
+    def tick(self, fps: int = 0) -> float:
+        """
+        Wait as long as necessary to keep the frame rate at or below `fps`,
+        where 0 means not to wait at all, and then advance all times by the
+        time that has passed since the last tick. Returns that time.
+        """
+        self._clock.tick(fps)
+
+        # Pygame only measures whole milliseconds, so measure the time
+        # separately to keep the timers from drifting.
+        now = time.perf_counter()
+        self._delta = now - self._last
+        self._last = now
+
+        self._wall_time += self._delta
+        self._state_time += self._delta
+        if not self._paused:
+            self._game_time += self._delta
+        return self._delta
+
+    def enter_state(self) -> None:
+        """
+        Start counting state time from zero, because a new state was just
+        entered.
+        """
+        self._state_time = 0.0
+
+    def pause(self) -> None:
+        """
+        Stop game time until `resume()` is called.
+        """
+        self._paused = True
+
+    def resume(self) -> None:
+        """
+        Let game time continue after it was stopped by `pause()`.
+        """
+        self._paused = False
+
+    def is_paused(self) -> bool:
+        """
+        Whether or not game time is currently stopped.
+        """
+        return self._paused
+
+    def get_delta(self) -> float:
+        """
+        Get the wall time that passed during the last tick.
+        """
+        return self._delta
+
+    def get_game_delta(self) -> float:
+        """
+        Get the game time that passed during the last tick, which is zero
+        while the clock is paused.
+        """
+        return 0.0 if self._paused else self._delta
+
+    def get_wall_time(self) -> float:
+        """
+        Get the total wall time since the clock was created.
+        """
+        return self._wall_time
+
+    def get_game_time(self) -> float:
+        """
+        Get the total game time since the clock was created.
+        """
+        return self._game_time
+
+    def get_state_time(self) -> float:
+        """
+        Get the wall time since the current state was entered.
+        """
+        return self._state_time
+
+
 class StateHandlerContext:
     """
     The state handler context is populated by the main state machine event
@@ -56,24 +171,60 @@ class StateHandlerContext:
     everything necessary to draw to the screen, process user input, and update
     the game state.
 
-    The state machine is run iteratively at a fixed frame rate. A
-    `StateHandlerContext` gets generated for each and every frame that is
-    rendered. During each iteration, all events are collected and passed into
-    the context so that handlers can handle any events that may have passed
-    since the handler function was last executed.
+    The state machine is run iteratively at a fixed frame rate. A single
+    `StateHandlerContext` is created when the game starts, and updated in
+    place with `begin_frame()` for each and every frame that is rendered, so
+    that running the loop doesn't allocate anything. During each iteration,
+    all events are collected and passed into the context so that handlers can
+    handle any events that may have passed since the handler function was
+    last executed.
+
+    Since the context is reused, state handlers must not hold on to anything
+    they get from it, such as the list of events, past the current frame.
     """
 
+    __slots__ = ('_state', '_events', '_window', '_gui', '_delta',
+                 '_storage', '_redraw', '_dirty_rects', '_clock')
+
     def __init__(self,
                  state: GameState, events: list[pygame.event.Event] | None,
                  window: pygame.Surface,
                  gui: pygame_gui.UIManager,
-                 delta: float, storage: dict):
+                 delta: float, storage: dict,
+                 redraw: bool = True, clock: GameClock | None = None):
         self._state = state
         self._events = events
         self._window = window
         self._gui = gui
         self._delta = delta
         self._storage = storage
+        self._redraw = redraw
+        self._dirty_rects = []
+        self._clock = clock if clock is not None else GameClock()
+
+    def begin_frame(self, state: GameState,
+                    events: list[pygame.event.Event],
+                    delta: float, redraw: bool) -> None:
+        """
+        Update this context in place for a new frame. This is only meant to
+        be called by the state machine loop. The storage, window, GUI and
+        clock are kept, and the dirty rectangles of the last frame are
+        forgotten.
+        """
+        self._state = state
+        self._events = events
+        self._delta = delta
+        self._redraw = redraw
+        self._dirty_rects.clear()
+
+    def set_state(self, state: GameState) -> None:
+        """
+        Change the current game state in the middle of a frame. This is only
+        meant to be called by the state machine loop, right before it calls
+        `StateHandler.on_exit()`, so that the handler knows which state is
+        next.
+        """
+        self._state = state
 
     def get_state(self) -> GameState:
         """
@@ -109,6 +260,11 @@ class StateHandlerContext:
         are black parts on the window that a state handler did not draw, it is
         simply because the state handler did not blit anything over the empty
         frame in that location.
+
+        The exception to this are state handlers that opt in to dirty
+        rectangle rendering (see `StateHandler.uses_dirty_rects()`). For
+        those handlers, the window is only cleared when `needs_redraw()`
+        returns `True`; otherwise, it holds whatever was drawn last frame.
         """
         return self._window
 
@@ -135,6 +291,14 @@ class StateHandlerContext:
         """
         return self._delta
 
+    def get_clock(self) -> GameClock:
+        """
+        Get the game clock, which keeps track of the game time and the time
+        spent in the current state. Use it instead of creating a separate
+        `pygame.time.Clock`, which would make the game wait twice per frame.
+        """
+        return self._clock
+
     def get_storage(self) -> dict:
         """
         Get a dictionary that is accessible to all state handlers. This storage
@@ -148,6 +312,35 @@ class StateHandlerContext:
         """
         return self._storage
 
+    def needs_redraw(self) -> bool:
+        """
+        Whether or not the window was cleared before this frame, which means
+        the state handler must draw the entire frame. This is always `True`
+        for state handlers that don't use dirty rectangles. For those that do,
+        it is `True` on the first frame after the state is entered, as well
+        as any time the window contents are lost, such as when the window was
+        covered up by another window and then exposed again.
+        """
+        return self._redraw
+
+    def add_dirty_rect(self, rect: pygame.Rect) -> None:
+        """
+        Report a region of the window that a state handler changed during
+        this frame. When the state handler uses dirty rectangles, only the
+        reported regions are pushed to the display at the end of the frame,
+        so anything drawn outside of them won't show up until the next full
+        redraw. This has no effect for state handlers that don't use dirty
+        rectangles, because the entire window is updated anyway.
+        """
+        self._dirty_rects.append(rect)
+
+    def get_dirty_rects(self) -> list[pygame.Rect]:
+        """
+        Get the list of regions reported with `add_dirty_rect()` during this
+        frame.
+        """
+        return self._dirty_rects
+
 
 class StateHandler:
     """
@@ -167,6 +360,99 @@ class StateHandler:
         """
         pass
 
+    @classmethod
+    def is_ready(cls) -> bool:
+        """
+        Whether a handler of this class can be constructed right now without
+        having to wait for anything that is being loaded in the background.
+        The `HandlerRegistry` only pre-warms handlers that are ready.
+        """
+        return True
+
+    def is_overlay(self) -> bool:
+        """
+        Whether or not this state handler is an overlay. When the game enters
+        an overlay state, the previous state isn't exited; it is suspended
+        with `on_suspend()` instead, and stays on the `StateStack` below the
+        overlay. When the overlay then returns the suspended state from
+        `process()`, the suspended state is resumed with `on_resume()`
+        instead of being entered again, so it continues exactly where it left
+        off. If the overlay returns any other state, all states on the stack
+        are exited, top to bottom.
+
+        On the first frame of an overlay, the window still holds the last
+        frame of the suspended state, so that the overlay can draw over it.
+        Overlays must not register any Pygame GUI components, because the
+        components of the suspended state stay registered.
+
+        By default, state handlers are not overlays.
+        """
+        return False
+
+    def on_suspend(self, context: StateHandlerContext) -> None:
+        """
+        This function is invoked instead of `on_exit()` when an overlay state
+        is entered on top of this state. `context.get_state()` is the overlay
+        state. Any Pygame GUI components that this state registered stay
+        registered, so they should be hidden here if they shouldn't show up
+        under the overlay.
+        """
+        pass
+
+    def on_resume(self, context: StateHandlerContext) -> None:
+        """
+        This function is invoked instead of `on_enter()` when the overlay
+        that was entered on top of this state returns to it. It is followed
+        by `process()` on the same frame.
+        """
+        pass
+
+    def uses_dirty_rects(self) -> bool:
+        """
+        Whether or not this state handler reports the regions of the window
+        it changes with `StateHandlerContext.add_dirty_rect()`. By default,
+        state handlers redraw the entire window on every frame and the entire
+        display is updated. A state handler that returns `True` here instead
+        only has to draw the whole window when
+        `StateHandlerContext.needs_redraw()` says so, and only the regions it
+        reports are updated on every other frame. This saves a lot of time on
+        screens where little or nothing moves, such as the menus.
+
+        Note that Pygame GUI components are not tracked, so a state handler
+        that registers any should either not use dirty rectangles, or report
+        the regions of its components itself.
+        """
+        return False
+
+    def get_event_types(self) -> tuple[int] | None:
+        """
+        The types of user input events that this state handler handles,
+        such as `pygame.MOUSEBUTTONUP`. Only those input events show up in
+        `StateHandlerContext.get_events()`, and input events that no state
+        handler wants are never even queued. This is checked each time the
+        state is entered. Events that aren't user input, such as
+        `pygame.QUIT` and custom events, are always delivered. See the
+        `event_router` module for details.
+
+        By default, state handlers handle all events, which is also what
+        state handlers that register Pygame GUI components must do.
+        """
+        return None
+
+    def is_idle(self, context: StateHandlerContext) -> bool:
+        """
+        Whether or not this state handler is done drawing until something
+        happens. This is checked after every call to `process()`. As long as
+        it returns `True`, the state machine loop doesn't run at its usual
+        frame rate; it sleeps until an event arrives, and calls `process()`
+        again only then, or once a second at the latest. This keeps the game
+        from using any processing power on screens that only change in
+        response to user input, such as the menus.
+
+        By default, state handlers are never idle.
+        """
+        return False
+
     def on_enter(self, context: StateHandlerContext) -> None:
         """
         This function is invoked at the rising edge of a state transition. A
@@ -214,6 +500,194 @@ class StateHandler:
         to worry about de-registering them on exit. Note, of course, that this
         function may be overridden and thus not execute if the child function
         does not make a call to `super().on_exit()`.
+
+        Overlays don't clear the Pygame GUI, because it belongs to the state
+        they were entered from.
+        """
+        if not self.is_overlay():
+            gui_manager = context.get_gui()
+            gui_manager.clear_and_reset()
+
+
+class StateStack:
+    """
+    The stack of active states. Normally, only a single state is active, but
+    when an overlay state is entered (see `StateHandler.is_overlay()`), it is
+    pushed on top of the state it was entered from, which stays active
+    underneath it while suspended. The state on top of the stack is the one
+    that the state machine loop runs.
+    """
+
+    def __init__(self, state: GameState):
+        """
+        Construct a new state stack that holds just the given state.
+        """
+        self._states = [state]
+
+    def top(self) -> GameState:
+        """
+        Get the state on top of the stack, which is the current state.
+        """
+        return self._states[-1]
+
+    def below(self) -> GameState | None:
+        """
+        Get the state right below the top of the stack, which is the state
+        that the current overlay was entered from, or `None` if the current
+        state isn't an overlay.
+        """
+        return self._states[-2] if len(self._states) > 1 else None
+
+    def push(self, state: GameState) -> None:
+        """
+        Push an overlay state on top of the stack.
+        """
+        self._states.append(state)
+
+    def pop(self) -> GameState:
+        """
+        Remove the state on top of the stack, returning it. The state below
+        it becomes the current state again.
+        """
+        return self._states.pop()
+
+    def replace(self, state: GameState) -> list[GameState]:
+        """
+        Replace all states on the stack with the given state, returning the
+        states that were removed, from top to bottom.
+        """
+        removed = self._states[::-1]
+        self._states = [state]
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+
+class LoopMonitor:
+    """
+    A `LoopMonitor` is notified by the state machine loop as it runs, which
+    allows outside code to observe the game without modifying any of the
+    state handlers. It is primarily used by the `bench` module to measure how
+    long each state handler takes, but it may be used for any other kind of
+    instrumentation as well.
+
+    Monitors may also post events to the Pygame event queue in
+    `begin_frame()`, which will be processed during that same frame. This is
+    how the game can be driven without any user input.
+
+    By default, a `LoopMonitor` does nothing at all, so that one can be used
+    unconditionally by the main loop.
+    """
+
+    def begin_frame(self, state: GameState) -> None:
+        """
+        Invoked at the start of each frame, before the clock is ticked and
+        events are collected. `state` is the state that the state machine is
+        about to process.
+        """
+        pass
+
+    def begin(self, state: GameState, phase: str) -> None:
+        """
+        Invoked immediately before the state handler for `state` is invoked.
+        `phase` is the name of the `StateHandler` function that is about to
+        be invoked: `on_enter`, `process`, or `on_exit`.
+        """
+        pass
+
+    def end(self, state: GameState, phase: str) -> None:
+        """
+        Invoked immediately after the state handler function that was
+        announced by the matching call to `begin()` has returned.
+        """
+        pass
+
+    def end_frame(self, state: GameState) -> None:
+        """
+        Invoked at the end of each frame, after the display was updated.
+        `state` is the state that was processed during the frame, which is
+        not necessarily the state that will be processed next.
+        """
+        pass
+
+
+class HandlerRegistry:
+    """
+    The `HandlerRegistry` maps each `GameState` to the `StateHandler` that
+    handles it. Handlers are registered as factories&mdash;usually just the
+    handler class itself&mdash;and each handler is only constructed the first
+    time its state is entered, so that the game doesn't have to load the
+    assets of every single screen before it can show the first one.
+
+    To keep state transitions from stalling on construction, the registry
+    can also pre-warm the handlers of the states that are likely to be
+    entered next while the game is otherwise idle.
+    """
+
+    def __init__(self, factories: dict, likely_next: dict,
+                 monitor: LoopMonitor, prewarm: bool = True):
+        """
+        Create a new registry. `factories` maps each `GameState` to a
+        function that takes a `StateHandlerContext` and returns the
+        `StateHandler` for that state. `likely_next` maps each `GameState` to
+        a list of states that are likely to be entered after it, in order of
+        likelihood. Handler construction is reported to `monitor` as the
+        `__init__` phase. If `prewarm` is `False`, `prewarm()` never
+        constructs anything, and handlers are only constructed on demand.
+        """
+        self._factories = factories
+        self._likely_next = likely_next if prewarm else {}
+        self._monitor = monitor
+        self._handlers = {}
+        self._timings = {}
+
+    def __contains__(self, state: GameState) -> bool:
+        return state in self._factories
+
+    def _construct(self, state: GameState,
+                   context: StateHandlerContext) -> StateHandler:
+        start = time.perf_counter()
+        self._monitor.begin(state, '__init__')
+        handler = self._factories[state](context)
+        self._monitor.end(state, '__init__')
+        self._timings[state] = time.perf_counter() - start
+
+        self._handlers[state] = handler
+        return handler
+
+    def get(self, state: GameState,
+            context: StateHandlerContext) -> StateHandler:
+        """
+        Get the state handler for the given state, constructing it with the
+        given context if it hasn't been constructed yet.
+        """
+        handler = self._handlers.get(state)
+        if handler is None:
+            handler = self._construct(state, context)
+        return handler
+
+    def prewarm(self, state: GameState, context: StateHandlerContext) -> bool:
+        """
+        Construct the handler of the most likely state to follow `state`
+        that hasn't already been constructed. At most one handler is
+        constructed per call, so that the cost of pre-warming is spread out
+        over several frames. Returns `True` if a handler was constructed.
+        """
+        for next_state in self._likely_next.get(state, []):
+            if next_state in self._handlers:
+                continue
+            # Handlers that would have to wait for something to finish
+            # loading are left for a later frame.
+            is_ready = getattr(self._factories[next_state], 'is_ready', None)
+            if is_ready is None or is_ready():
+                self._construct(next_state, context)
+                return True
+        return False
+
+    def get_timings(self) -> dict:
+        """
+        Get the time it took (in *seconds*) to construct each of the state
+        handlers that have been constructed so far, keyed by `GameState`.
         """
-        gui_manager = context.get_gui()
-        gui_manager.clear_and_reset()
+        return dict(self._timings)
@@ -0,0 +1,102 @@
+"""
+Heads-up display rendering for readouts that change on every frame, such as
+timers. A string cache doesn't help with those, because the text is
+different every frame, so rendering them would rasterize the text and
+allocate a new surface every single frame.
+
+Instead, a `GlyphAtlas` renders every character that a readout can contain
+into a single atlas surface once, along with any static labels, and then
+draws text by blitting the individual glyphs out of the atlas.
+"""
+import pygame
+
+import text_cache
+
+DIGITS = "0123456789+-.:/s "
+"""The characters needed to draw numbers, times, and scores."""
+
+
+class GlyphAtlas:
+    """
+    A `GlyphAtlas` holds pre-rendered glyphs and labels of a single font
+    size and color, all packed into one surface.
+    """
+
+    def __init__(self, size: int, chars: str = DIGITS,
+                 labels: list[str] = (), color='white'):
+        """
+        Construct a new glyph atlas by rendering every character in `chars`
+        and every string in `labels` with the game font at the given size
+        and color.
+        """
+        self._size = size
+        self._color = color
+        font = text_cache.get().get_font(size)
+
+        strings = list(dict.fromkeys(chars)) + list(labels)
+        rendered = [font.render(string, True, color) for string in strings]
+
+        width = sum(surface.get_width() for surface in rendered)
+        height = max([surface.get_height() for surface in rendered] + [1])
+        self._height = height
+        self._atlas = pygame.Surface((max(width, 1), height), pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            self._atlas = self._atlas.convert_alpha()
+
+        # Pack everything side by side, remembering where each one went.
+        self._areas = {}
+        x = 0
+        for string, surface in zip(strings, rendered):
+            self._atlas.blit(surface, (x, 0))
+            self._areas[string] = pygame.Rect(x, 0, surface.get_width(),
+                                              height)
+            x += surface.get_width()
+
+    def get_height(self) -> int:
+        """
+        Get the height of a line of text drawn from this atlas.
+        """
+        return self._height
+
+    def get_width(self, text: str) -> int:
+        """
+        Get the width of the given text or label when drawn from this
+        atlas, without drawing it.
+        """
+        area = self._areas.get(text)
+        if area is not None:
+            return area.width
+
+        width = 0
+        for char in text:
+            area = self._areas.get(char)
+            if area is None:
+                width += text_cache.get().render(
+                    char, self._size, self._color).get_width()
+            else:
+                width += area.width
+        return width
+
+    def draw(self, window: pygame.Surface, text: str, pos) -> int:
+        """
+        Draw a label or a string of characters at the given position,
+        returning the x coordinate just past the end of the drawn text, so
+        that more text can be drawn right after it. Characters that aren't
+        in the atlas are rendered through the text cache instead.
+        """
+        x, y = pos
+        area = self._areas.get(text)
+        if area is not None:
+            window.blit(self._atlas, (x, y), area)
+            return x + area.width
+
+        for char in text:
+            area = self._areas.get(char)
+            if area is None:
+                glyph = text_cache.get().render(char, self._size, self._color)
+                window.blit(glyph, (x, y))
+                x += glyph.get_width()
+            else:
+                window.blit(self._atlas, (x, y), area)
+                x += area.width
+        return x
@@ -0,0 +1,229 @@
+"""
+Obstacle management for the level. The `ObstacleManager` keeps track of any
+number of obstacles of any kind as they scroll across the screen, recycles
+them once they have scrolled off the left edge, and answers collision
+queries against them.
+
+All obstacles scroll at the same speed, so the manager stores their
+positions relative to the start of the level instead of the screen. That
+way, scrolling never has to touch any obstacle at all, and the obstacles
+stay sorted by position forever, which allows collision queries to use a
+binary search to find the few obstacles that could possibly be hit, rather
+than testing every obstacle.
+"""
+import bisect
+
+import pygame
+
+import collision
+
+
+class Obstacle:
+    """
+    A single obstacle. Obstacles are owned and recycled by an
+    `ObstacleManager`, so they should never be constructed directly, and
+    references to them should not be kept after they have been recycled.
+    """
+
+    def __init__(self):
+        self.image = None
+        """The image drawn for this obstacle, which also determines its
+        size."""
+
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        """The hitbox of this obstacle, in screen coordinates. It is updated
+        by the manager as the obstacle scrolls."""
+
+        self.position = 0.0
+        """The position of the left edge of this obstacle, relative to the
+        start of the level."""
+
+
+class ObstacleManager:
+    """
+    An `ObstacleManager` holds all the obstacles in a level, sorted by their
+    position. Obstacles that scroll off the screen are put back into a pool,
+    from which new obstacles are taken, so that no obstacles are allocated
+    once the pool has grown large enough.
+    """
+
+    def __init__(self):
+        self._offset = 0.0
+        self._active = []
+        self._positions = []
+        self._pool = []
+        self._max_width = 0
+        self._distance = 0.0
+
+    def _update_rect(self, obstacle: Obstacle) -> pygame.Rect:
+        obstacle.rect.x = round(obstacle.position - self._offset)
+        return obstacle.rect
+
+    def spawn(self, image: pygame.Surface, x: float, y: int) -> Obstacle:
+        """
+        Add a new obstacle with the given image at the given screen
+        position.
+        """
+        obstacle = self._pool.pop() if self._pool else Obstacle()
+        obstacle.image = image
+        obstacle.position = x + self._offset
+        obstacle.rect.update(0, y, image.get_width(), image.get_height())
+        self._update_rect(obstacle)
+        self._max_width = max(self._max_width, image.get_width())
+
+        i = bisect.bisect_right(self._positions, obstacle.position)
+        self._positions.insert(i, obstacle.position)
+        self._active.insert(i, obstacle)
+        return obstacle
+
+    def scroll(self, distance: float, recycle_x: float) -> None:
+        """
+        Scroll all obstacles to the left by the given number of pixels.
+        Obstacles whose left edge was already left of the `recycle_x` screen
+        coordinate before scrolling are removed and put back into the pool.
+        Recycling only happens a frame late so that `sweep()` still sees
+        obstacles that crossed the screen in a single frame.
+        """
+        # Obstacles are sorted, so the ones to recycle are all at the front.
+        n = bisect.bisect_left(self._positions, recycle_x + self._offset)
+        if n:
+            self._pool.extend(self._active[:n])
+            del self._active[:n]
+            del self._positions[:n]
+
+        self._offset += distance
+        self._distance = distance
+
+    def clear(self) -> None:
+        """
+        Remove all obstacles, putting them back into the pool, and reset the
+        scroll position.
+        """
+        self._pool.extend(self._active)
+        self._active.clear()
+        self._positions.clear()
+        self._offset = 0.0
+        self._distance = 0.0
+
+    def first(self) -> Obstacle | None:
+        """
+        Get the left-most obstacle, or `None` if there are no obstacles.
+        """
+        if not self._active:
+            return None
+        obstacle = self._active[0]
+        self._update_rect(obstacle)
+        return obstacle
+
+    def last(self) -> Obstacle | None:
+        """
+        Get the right-most obstacle, or `None` if there are no obstacles.
+        """
+        if not self._active:
+            return None
+        obstacle = self._active[-1]
+        self._update_rect(obstacle)
+        return obstacle
+
+    def upcoming(self, x: float) -> Obstacle | None:
+        """
+        Get the left-most obstacle whose right edge isn't left of the given
+        screen coordinate, which is the next obstacle that something at `x`
+        runs into, or `None` if there is no such obstacle.
+        """
+        # Obstacles that start more than the widest obstacle before `x` end
+        # before it, too.
+        i = bisect.bisect_left(self._positions,
+                               x + self._offset - self._max_width)
+        while i < len(self._active):
+            obstacle = self._active[i]
+            if self._update_rect(obstacle).right >= x:
+                return obstacle
+            i += 1
+        return None
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def candidates(self, left: float, right: float) -> list[Obstacle]:
+        """
+        Get all obstacles that horizontally overlap the screen interval
+        between `left` and `right`. This is the broad phase of collision
+        detection: only the obstacles that are returned here could possibly
+        collide with anything in that interval.
+        """
+        # An obstacle overlaps if its left edge is before the right end of
+        # the interval, and its right edge is after the left end. The right
+        # edge is at most the widest obstacle past the left edge.
+        start = bisect.bisect_right(
+            self._positions, left + self._offset - self._max_width)
+        end = bisect.bisect_left(self._positions, right + self._offset)
+
+        found = []
+        for obstacle in self._active[start:end]:
+            rect = self._update_rect(obstacle)
+            if rect.right > left and rect.left < right:
+                found.append(obstacle)
+        return found
+
+    def collide(self, rect: pygame.Rect,
+                mask: pygame.mask.Mask | None = None) -> Obstacle | None:
+        """
+        Get the first obstacle that collides with the given rectangle, or
+        `None` if it doesn't collide with any obstacle. If a `mask` is
+        given, collisions are pixel-accurate, using the mask for the
+        rectangle and the masks of the obstacles' images.
+        """
+        for obstacle in self.candidates(rect.left, rect.right):
+            if mask is None:
+                if obstacle.rect.colliderect(rect):
+                    return obstacle
+            elif collision.collide_mask(
+                    rect, mask, obstacle.rect,
+                    collision.get_mask(obstacle.image)):
+                return obstacle
+        return None
+
+    def sweep(self, previous: pygame.Rect, rect: pygame.Rect,
+              mask: pygame.mask.Mask | None = None) -> Obstacle | None:
+        """
+        Get the first obstacle that the given rectangle ran into while it
+        moved from `previous` to `rect` during the last `scroll()`, or
+        `None` if it didn't run into any obstacle. Unlike `collide()`, this
+        doesn't miss obstacles that scrolled past the rectangle entirely
+        within a single frame. `mask` works the same way as it does for
+        `collide()`.
+        """
+        # Work relative to the obstacles, which makes them stand still and
+        # the rectangle move by the distance they scrolled instead.
+        start = previous.move(-self._distance, 0)
+        dx = rect.x - start.x
+        dy = rect.y - start.y
+
+        hit = None
+        first = None
+        for obstacle in self.candidates(min(start.left, rect.left),
+                                        max(start.right, rect.right)):
+            if mask is None:
+                time = collision.sweep(start, dx, dy, obstacle.rect)
+            else:
+                time = collision.sweep_mask(
+                    start, mask, dx, dy, obstacle.rect,
+                    collision.get_mask(obstacle.image))
+            if time is not None and (first is None or time < first):
+                hit = obstacle
+                first = time
+        return hit
+
+    def draw(self, window: pygame.Surface, alpha: float = 1.0) -> None:
+        """
+        Draw all obstacles that are visible on the screen. `alpha` is how
+        far along the last `scroll()` to draw them, from 0 for where they
+        were before to 1 for where they are now.
+        """
+        # Obstacles are drawn up to a scroll step behind their hitboxes.
+        behind = self._distance * (1 - alpha)
+        for obstacle in self.candidates(-behind, window.get_width() - behind):
+            window.blit(obstacle.image,
+                        (round(obstacle.position - self._offset + behind),
+                         obstacle.rect.y))
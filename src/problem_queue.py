@@ -0,0 +1,123 @@
+"""
+Prefetched problems for the level. Generating a problem is cheap today, but
+it happens right in the middle of a frame, whenever the player gets over an
+obstacle, and more involved kinds of problems would stall the game exactly
+when it is at its busiest.
+
+A `ProblemQueue` keeps a few problems of every difficulty ready ahead of
+time, and refills them in a background thread whenever one is taken, so the
+level only ever pops a problem that already exists. Hard problems are
+expressions with up to three operands from `expression`, whose templates
+are compiled once, when this module is imported. Infinite mode's
+adaptive problems are queued the same way, by category, so whichever
+category the `adaptive.SkillModel` picks next is always stocked.
+
+Note that you should use problem_queue.get() to get the default instance of
+ProblemQueue instead of instantiating it yourself.
+"""
+import collections
+import threading
+from typing import Callable
+
+import adaptive
+import arithmetic
+import expression
+import log
+
+DIFFICULTIES = ["easy", "medium", "hard"]
+"""The modes of the default queue that are difficulties. All other modes are
+the keys of adaptive categories."""
+
+# Two or three operands, with exact answers that can be fractions.
+_expressions = expression.ExpressionGenerator(-10, 10, operands=(2, 3))
+
+
+def _generate(mode: str) -> tuple:
+    if mode == "hard":
+        return _expressions.generate()
+    elif mode in DIFFICULTIES:
+        return arithmetic.generate_arithmetic(mode)
+    return adaptive.generate_problem(mode)
+
+
+class ProblemQueue:
+    """
+    A `ProblemQueue` holds a queue of problems for each of a number of
+    modes, which are generated by a function that takes the mode.
+    """
+
+    def __init__(self, generate: Callable[[str], tuple], modes: list[str],
+                 depth: int):
+        """
+        Construct a new problem queue that keeps `depth` problems ready for
+        each of the given modes, generated with `generate(mode)`. Nothing is
+        generated until `start()` is called.
+        """
+        self._generate = generate
+        self._depth = depth
+        self._queues = {mode: collections.deque() for mode in modes}
+        self._wanted = threading.Event()
+        self._thread = None
+
+    def _fill(self) -> None:
+        for mode, queue in self._queues.items():
+            while len(queue) < self._depth:
+                queue.append(self._generate(mode))
+
+    def _run(self) -> None:
+        while True:
+            self._wanted.wait()
+            # Cleared before filling, so that a problem taken while filling
+            # wakes this thread up again right after.
+            self._wanted.clear()
+            self._fill()
+
+    def start(self, background: bool = True) -> None:
+        """
+        Fill all queues and keep them filled. If `background` is `True`, this
+        is done by a separate thread, and this returns immediately;
+        otherwise, the queues are filled once before this returns, and are
+        only refilled by further calls.
+        """
+        if not background:
+            self._fill()
+            return
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._wanted.set()
+
+    def pop(self, mode: str) -> tuple:
+        """
+        Take the next problem of the given mode. If none is ready, because
+        the queue was never started or couldn't keep up, one is generated
+        right away instead.
+        """
+        # Deques can be appended to and popped from by different threads
+        # without any locking.
+        try:
+            problem = self._queues[mode].popleft()
+        except IndexError:
+            log.msg(log.DEBUG, f"No {mode} problem was ready")
+            problem = self._generate(mode)
+        if self._thread is not None:
+            self._wanted.set()
+        return problem
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+
+#  Construct a global, default problem queue.
+_queue = ProblemQueue(
+    _generate,
+    DIFFICULTIES + [adaptive.get_key(c) for c in adaptive.CATEGORIES], 8)
+
+
+def get() -> ProblemQueue:
+    """
+    Get the global, default ProblemQueue, which holds the arithmetic
+    problems that the level asks, by difficulty and by adaptive category.
+    """
+    return _queue
@@ -0,0 +1,126 @@
+"""
+A tile-based parallax background scroller. A scene is made up of one or more
+layers, each of which is an endless horizontal strip of tiles that repeats
+itself. Each layer scrolls at its own fraction of the scene's scroll speed,
+which is what creates the parallax effect when there is more than one layer.
+
+Only the tiles that actually overlap the viewport are drawn, so a layer
+never costs more than the tiles needed to cover the screen, regardless of
+how many tiles it has.
+"""
+import bisect
+import math
+
+import pygame
+
+
+class ScrollLayer:
+    """
+    A single layer of a `ParallaxScroller`: an ordered list of tiles laid out
+    side by side, which repeats forever.
+    """
+
+    def __init__(self, tiles: list[pygame.Surface], factor: float, y: int):
+        """
+        Create a new layer from the given tiles. `factor` is the fraction of
+        the scene's scroll distance that this layer scrolls by, and `y` is
+        the vertical position at which the layer is drawn.
+        """
+        self._tiles = tiles
+        self._factor = factor
+        self._y = y
+
+        # The left edge of each tile within the strip, so that the first
+        # visible tile can be found with a binary search.
+        self._edges = []
+        width = 0
+        for tile in tiles:
+            self._edges.append(width)
+            width += tile.get_width()
+        self._width = width
+
+    def get_width(self) -> int:
+        """
+        Get the width of the entire strip of tiles, after which it repeats.
+        """
+        return self._width
+
+    def draw(self, window: pygame.Surface, offset: float) -> None:
+        """
+        Draw the part of this layer that is visible when the scene has been
+        scrolled by `offset` pixels.
+        """
+        if self._width <= 0:
+            return
+
+        # Snap to whole pixels only once for the entire layer, so that tiles
+        # never drift apart and leave seams between them.
+        position = math.floor((offset * self._factor) % self._width)
+
+        i = bisect.bisect_right(self._edges, position) - 1
+        x = self._edges[i] - position
+        view_width = window.get_width()
+        while x < view_width:
+            tile = self._tiles[i]
+            window.blit(tile, (x, self._y))
+            x += tile.get_width()
+            i = (i + 1) % len(self._tiles)
+
+
+class ParallaxScroller:
+    """
+    A `ParallaxScroller` keeps track of how far a scene has scrolled and
+    draws all of its layers accordingly. The scroll distance is kept as a
+    float, so that the scene can scroll smoothly by fractions of a pixel per
+    frame at any speed.
+
+    The scroller also remembers where it was before the last `scroll()`, so
+    that a scene which is simulated in fixed steps can be drawn anywhere in
+    between two steps.
+    """
+
+    def __init__(self):
+        self._layers = []
+        self._offset = 0.0
+        self._previous = 0.0
+
+    def add_layer(self, tiles: list[pygame.Surface], factor: float = 1.0,
+                  y: int = 0) -> ScrollLayer:
+        """
+        Add a new layer on top of all existing layers. See `ScrollLayer` for
+        the meaning of the arguments.
+        """
+        layer = ScrollLayer(tiles, factor, y)
+        self._layers.append(layer)
+        return layer
+
+    def scroll(self, distance: float) -> None:
+        """
+        Scroll the scene to the left by the given number of pixels.
+        """
+        self._previous = self._offset
+        self._offset += distance
+
+    def get_offset(self) -> float:
+        """
+        Get the total distance that the scene has been scrolled.
+        """
+        return self._offset
+
+    def set_offset(self, offset: float) -> None:
+        """
+        Set the total distance that the scene has been scrolled, such as to
+        reset it back to the start.
+        """
+        self._offset = offset
+        self._previous = offset
+
+    def draw(self, window: pygame.Surface, alpha: float = 1.0) -> None:
+        """
+        Draw all layers, back to front. `alpha` is how far along the last
+        `scroll()` to draw the scene, from 0 for where it was before to 1 for
+        where it is now.
+        """
+        offset = self._previous + (self._offset - self._previous) * alpha
+        for layer in self._layers:
+            layer.draw(window, offset)
@@ -0,0 +1,166 @@
+"""
+Preloaded sound effects. Decoding a sound file takes long enough to cause a
+visible hitch, so instead of creating a `pygame.mixer.Sound` whenever an
+effect is played, all sound effects are decoded once, ahead of time, and
+kept in memory in a `SoundBank`.
+
+Sound effects are played through a small pool of mixer channels that are
+reserved for the bank, so that effects never have to fight with anything
+else for a channel, and the bank never has to search all channels for a
+free one.
+
+Note that you should use sound_bank.get() to get the default instance of
+SoundBank instead of instantiating it yourself.
+"""
+import os
+import threading
+
+import pygame
+
+import log
+
+
+class SoundBank:
+    """
+    A `SoundBank` holds decoded sound effects from a single directory, all
+    of which are played at the same volume through the same pool of
+    channels.
+    """
+
+    def __init__(self, directory: str, channels: int, volume: float):
+        """
+        Construct a new sound bank that loads sound effects from the given
+        directory. `channels` is the number of mixer channels reserved for
+        the bank, which is the number of effects that can be played at the
+        same time, and `volume` is the volume at which all effects are
+        played, between 0 and 1.
+        """
+        self._directory = directory
+        self._n_channels = channels
+        self._volume = volume
+        self._sounds = {}
+        # The effects that the preloading thread has yet to decode. These
+        # and the effects themselves are shared with the thread, so they
+        # are only changed while holding the lock.
+        self._loading = set()
+        self._lock = threading.Lock()
+        self._channels = []
+        self._next_channel = 0
+
+    def _load(self, name: str) -> pygame.mixer.Sound | None:
+        path = os.path.join(self._directory, name)
+        try:
+            sound = pygame.mixer.Sound(path)
+        except (pygame.error, FileNotFoundError):
+            # The game is perfectly playable without sound effects. The
+            # failure is remembered, so that it is neither retried nor
+            # logged again every time the effect is played.
+            log.msg(log.WARNING, f"Unable to load sound effect: {path}")
+            sound = None
+        else:
+            sound.set_volume(self._volume)
+
+        with self._lock:
+            self._sounds[name] = sound
+            self._loading.discard(name)
+        return sound
+
+    def preload(self, names: list[str], background: bool = True) -> None:
+        """
+        Reserve the mixer channels for this bank and decode the given sound
+        effects. If `background` is `True`, the effects are decoded in a
+        separate thread so that the caller doesn't have to wait for them.
+        The mixer must be initialized before this is called.
+        """
+        if not pygame.mixer.get_init():
+            log.msg(log.WARNING, "Mixer is not available; no sound effects.")
+            return
+
+        if not self._channels:
+            if pygame.mixer.get_num_channels() < self._n_channels:
+                pygame.mixer.set_num_channels(self._n_channels)
+            pygame.mixer.set_reserved(self._n_channels)
+            self._channels = [pygame.mixer.Channel(i)
+                              for i in range(self._n_channels)]
+
+        with self._lock:
+            names = [name for name in names
+                     if name not in self._sounds and name not in self._loading]
+            self._loading.update(names)
+
+        def load_all():
+            for name in names:
+                self._load(name)
+
+        if background:
+            threading.Thread(target=load_all, daemon=True).start()
+        else:
+            load_all()
+
+    def play(self, name: str) -> None:
+        """
+        Play a sound effect. The effect should have been preloaded; if it
+        hasn't finished loading yet, it is loaded now, which will cause the
+        hitch that preloading is supposed to avoid. Effects that couldn't be
+        loaded are silently skipped, and so are effects that are still being
+        preloaded, rather than decoding them a second time.
+        """
+        with self._lock:
+            loading = name in self._loading
+            loaded = name in self._sounds
+            sound = self._sounds.get(name)
+        if loading:
+            log.msg(log.DEBUG, f"Sound effect is still loading: {name}")
+            return
+        if not loaded:
+            log.msg(log.DEBUG, f"Sound effect was not preloaded: {name}")
+            sound = self._load(name)
+        if sound is None:
+            return
+
+        if not self._channels:
+            sound.play()
+            return
+
+        # Prefer an idle channel. If all of them are busy, cut off the
+        # effect that has been playing the longest.
+        for i in range(len(self._channels)):
+            channel = self._channels[(self._next_channel + i) %
+                                     len(self._channels)]
+            if not channel.get_busy():
+                break
+        else:
+            channel = self._channels[self._next_channel]
+
+        self._next_channel = ((self._channels.index(channel) + 1) %
+                              len(self._channels))
+        channel.play(sound)
+
+    def set_volume(self, volume: float) -> None:
+        """
+        Set the volume of all sound effects in this bank, between 0 and 1.
+        """
+        self._volume = volume
+        with self._lock:
+            sounds = list(self._sounds.values())
+        for sound in sounds:
+            if sound is not None:
+                sound.set_volume(volume)
+
+    def get_volume(self) -> float:
+        """
+        Get the volume of the sound effects in this bank.
+        """
+        return self._volume
+
+
+#  Construct a global, default sound bank.
+_bank = SoundBank('music', 4, 0.5)
+
+
+def get() -> SoundBank:
+    """
+    Get the global, default SoundBank, which holds all of the game's sound
+    effects.
+    """
+    return _bank
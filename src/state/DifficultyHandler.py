@@ -7,8 +7,7 @@ the difficulty of the game in math mode. The game offers four difficulties:
 - Hard
 - Infinite
 """
-import pygame
-from state.MainMenuHandler import Button
+from widget import Button, Image, Label, StaticLayer, WidgetGroup
 import game_state
 from arg import load_asset
 
@@ -17,66 +16,70 @@ class DifficultyHandler(game_state.StateHandler):
     def __init__(self, context: game_state.StateHandlerContext):
         super().__init__(context)
 
-        self._image_border = load_asset('menu_border.png')
-        self._button = load_asset('button.png')
-        self._infinity = load_asset("infinity.png")
-        self._title_font = pygame.font.SysFont("consolas", 80)
-
         window = context.get_window()
-        width = window.get_width()
-        height = window.get_height()
 
-        self._infinity_image = pygame.transform.scale(
-            self._infinity, (100, 50))
-        self._image_border = pygame.transform.scale(
-            self._image_border, (width, height))
+        self._image_border = load_asset('menu_border.png', window.get_size())
+        self._button = load_asset('button.png', Button.SIZE)
+        self._infinity_image = load_asset("infinity.png", (100, 50))
 
-    def process(self, context: game_state.StateHandlerContext) \
-            -> game_state.GameState:
-        super().process(context)
+        self._widgets = None
 
-        window = context.get_window()
+    def on_enter(self, context: game_state.StateHandlerContext) -> None:
+        super().on_enter(context)
+
+        # The menu never changes, so it is only ever built once.
+        if self._widgets is None:
+            window = context.get_window()
 
-        # create button instances
-        easy_button = Button(125, 300, self._button, "EASY")
-        medium_button = Button(350, 300, self._button, "MEDIUM")
-        hard_button = Button(575, 300, self._button, "HARD")
-        infinite_button = Button(350, 175, self._button, "")
-        buttons = [easy_button, medium_button, hard_button, infinite_button]
+            self._widgets = WidgetGroup(self._button)
+            self._widgets.add(Image(0, 0, self._image_border))
+            self._easy_button = self._widgets.add_button(125, 300, "EASY")
+            self._medium_button = self._widgets.add_button(350, 300,
+                                                           "MEDIUM")
+            self._hard_button = self._widgets.add_button(575, 300, "HARD")
+            self._infinite_button = self._widgets.add_button(350, 175, "")
+            self._widgets.add(Image(400, 200, self._infinity_image))
+            self._widgets.add(Label(window.get_width() / 2, 75,
+                                    80, "DIFFICULTY"))
+            self._layer = StaticLayer(self._widgets.blit)
 
-        window.fill((100, 100, 100))  # Gray
-        window.blit(self._image_border, (0, 0))
+        self._layer.prepare(context.get_window().get_size())
 
-        for button in buttons:
-            button.blit(window)
+    def uses_dirty_rects(self) -> bool:
+        # Nothing on this screen moves, so it only has to be drawn once.
+        return True
 
-        difficulty = self._title_font.render("DIFFICULTY", True, "white")
+    def is_idle(self, context: game_state.StateHandlerContext) -> bool:
+        # Waits for the user to pick a difficulty.
+        return True
 
-        window.blit(self._infinity_image, (400, 200))
-        window.blit(difficulty, (((window.get_width() / 2) -
-                                  (difficulty.get_width() / 2)), 75))
+    def get_event_types(self) -> tuple[int]:
+        return Button.EVENT_TYPES
+
+    def process(self, context: game_state.StateHandlerContext) \
+            -> game_state.GameState:
+        super().process(context)
+
+        window = context.get_window()
 
-        clicked_buttons = []
+        if context.needs_redraw():
+            self._layer.blit(window)
 
-        # Dispatch all events to all buttons
-        for event in context.get_events():
-            for button in buttons:
-                if button.dispatch_event(event):
-                    clicked_buttons.append(button)
+        clicked_buttons = self._widgets.dispatch_events(context.get_events())
 
         context.get_storage()['live_game'] = 'math'
         # Handle buttons that were clicked
         for button in clicked_buttons:
-            if button == easy_button:
+            if button == self._easy_button:
                 context.get_storage()['difficulty'] = "easy"
                 return game_state.GameState.LEVEL_PLAY
-            elif button == medium_button:
+            elif button == self._medium_button:
                 context.get_storage()['difficulty'] = "medium"
                 return game_state.GameState.LEVEL_PLAY
-            elif button == hard_button:
+            elif button == self._hard_button:
                 context.get_storage()['difficulty'] = "hard"
                 return game_state.GameState.LEVEL_PLAY
-            elif button == infinite_button:
+            elif button == self._infinite_button:
                 context.get_storage()['difficulty'] = "infinite"
                 return game_state.GameState.LEVEL_PLAY
 
@@ -2,8 +2,7 @@
 This handler handles the `GAME_MODE` state, which allows the user to select
 either math mode or flashcard mode.
 """
-import pygame
-from state.MainMenuHandler import Button
+from widget import Button, Image, Label, StaticLayer, WidgetGroup
 import game_state
 from arg import load_asset
 
@@ -12,53 +11,56 @@ class GameModeHandler(game_state.StateHandler):
     def __init__(self, context: game_state.StateHandlerContext):
         super().__init__(context)
 
-        self._image_border = load_asset('menu_border.png')
-        self._button = load_asset('button.png')
-        self._title_font = pygame.font.SysFont("consolas", 80)
-        self._font = pygame.font.SysFont("consolas", 50)
-
         window = context.get_window()
-        width = window.get_width()
-        height = window.get_height()
 
-        self._image_border = pygame.transform.scale(
-            self._image_border, (width, height))
+        self._image_border = load_asset('menu_border.png', window.get_size())
+        self._button = load_asset('button.png', Button.SIZE)
 
-    def process(self, context: game_state.StateHandlerContext) \
-            -> game_state.GameState:
-        super().process(context)
+        self._widgets = None
 
-        window = context.get_window()
+    def on_enter(self, context: game_state.StateHandlerContext) -> None:
+        super().on_enter(context)
+
+        # The menu never changes, so it is only ever built once.
+        if self._widgets is None:
+            window = context.get_window()
 
-        # create button instances
-        math_button = Button(225, 300, self._button, "MATH")
-        card_button = Button(475, 300, self._button, "CARD")
-        buttons = [math_button, card_button]
+            self._widgets = WidgetGroup(self._button)
+            self._widgets.add(Image(0, 0, self._image_border))
+            self._widgets.add(Label(window.get_width() / 2, 75,
+                                    80, "GAME MODE"))
+            self._math_button = self._widgets.add_button(225, 300, "MATH")
+            self._card_button = self._widgets.add_button(475, 300, "CARD")
+            self._layer = StaticLayer(self._widgets.blit)
 
-        window.fill((100, 100, 100))  # Gray
-        window.blit(self._image_border, (0, 0))
+        self._layer.prepare(context.get_window().get_size())
 
-        for button in buttons:
-            button.blit(window)
+    def uses_dirty_rects(self) -> bool:
+        # Nothing on this screen moves, so it only has to be drawn once.
+        return True
 
-        game_mode = self._title_font.render("GAME MODE", True, "white")
+    def is_idle(self, context: game_state.StateHandlerContext) -> bool:
+        # Waits for the user to pick a mode.
+        return True
 
-        window.blit(game_mode, (((window.get_width() / 2) -
-                                 (game_mode.get_width() / 2)), 75))
-        clicked_buttons = []
+    def get_event_types(self) -> tuple[int]:
+        return Button.EVENT_TYPES
+
+    def process(self, context: game_state.StateHandlerContext) \
+            -> game_state.GameState:
+        super().process(context)
+
+        window = context.get_window()
 
-        # Dispatch all events to all buttons
-        for event in context.get_events():
-            for button in buttons:
-                if button.dispatch_event(event):
-                    clicked_buttons.append(button)
+        if context.needs_redraw():
+            self._layer.blit(window)
 
         # Handle buttons that were clicked
-        for button in clicked_buttons:
-            if button == math_button:
+        for button in self._widgets.dispatch_events(context.get_events()):
+            if button == self._math_button:
                 context.get_storage()['live_mode'] = "math"
                 return game_state.GameState.DIFFICULTY
-            if button == card_button:
+            if button == self._card_button:
                 context.get_storage()['live_mode'] = "card"
                 return game_state.GameState.LEVEL_PLAY
 
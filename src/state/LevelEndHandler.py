@@ -6,32 +6,49 @@ the user answered the equation incorrectly.
 This handler is responsible for displaying the end game menu, which prompts the
 player with a few buttons similar to the main menu.
 """
-import pygame
+import copy
 
-from pygame import mixer
 import game_state
 import user_data
 from arg import load_asset
 from game_state import StateHandlerContext
-from state.MainMenuHandler import Button
+from widget import Button, Image, Label, StaticLayer, WidgetGroup
 
 
 class LevelEndHandler(game_state.StateHandler):
     def __init__(self, context: game_state.StateHandlerContext):
         super().__init__(context)
-        self._title_font = pygame.font.SysFont("consolas", 80)
-        self._font = pygame.font.SysFont("consolas", 50)
-        self._border_image = load_asset('menu_border.png')
-        self._button = load_asset('button.png')
 
         window = context.get_window()
-        width = window.get_width()
-        height = window.get_height()
 
-        self._border_image = pygame.transform.scale(self._border_image,
-                                                    (width, height))
+        self._border_image = load_asset('menu_border.png', window.get_size())
+        self._button = load_asset('button.png', Button.SIZE)
+
+        self._widgets = None
+        self._results = None
 
     def on_enter(self, context: StateHandlerContext) -> None:
+        super().on_enter(context)
+
+        # The menu itself never changes, so it is only ever built once.
+        if self._widgets is None:
+            window = context.get_window()
+
+            self._widgets = WidgetGroup(self._button)
+            self._widgets.add(Image(0, 0, self._border_image))
+            self._reset_button = self._widgets.add_button(125, 300, "RESET")
+            self._back_button = self._widgets.add_button(350, 300, "BACK")
+            self._quit_button = self._widgets.add_button(575, 300, "QUIT")
+            self._widgets.add(Label(window.get_width() / 2, 75,
+                                    80, "GAME OVER"))
+
+            self._layer = StaticLayer(self._draw)
+
+        # The results, on the other hand, are different every time.
+        self._results = self._build_results(context)
+        self._layer.invalidate()
+        self._layer.prepare(context.get_window().get_size())
+
         # Save scores
         storage = context.get_storage()
         difficulty = storage['difficulty']
@@ -43,8 +60,12 @@ class LevelEndHandler(game_state.StateHandler):
 
             data = user_data.get()
 
-            if not data['scores']:
-                data['scores'] = {
+            # The scores are changed on a copy, which is pushed back into the
+            # store as a whole. That persists them right away, and hands the
+            # score screen new scores rather than the ones it displayed.
+            scores = copy.deepcopy(data['scores'])
+            if not scores:
+                scores = {
                     'math': {
                         'top': [],
                         'recent': []
@@ -63,85 +84,72 @@ class LevelEndHandler(game_state.StateHandler):
             # methods, which is what makes this work.
             #
             # pylint: disable=unsubscriptable-object
-            data['scores'][mode]['recent'].insert(0, score_obj)
-            data['scores'][mode]['top'].insert(0, score_obj)
+            scores[mode]['recent'].insert(0, score_obj)
+            scores[mode]['top'].insert(0, score_obj)
 
             # Truncate recent scores to 5 most recent.
-            del data['scores'][mode]['recent'][5:]
+            del scores[mode]['recent'][5:]
 
             # Sort scores so that the highest score floats to top
-            data['scores'][mode]['top'] = (
-                list(reversed(sorted(data['scores'][mode]['top'],
+            scores[mode]['top'] = (
+                list(reversed(sorted(scores[mode]['top'],
                                      key=lambda x: x['score']))))
 
             # Truncate top scores to 5 highest.
-            del data['scores'][mode]['top'][5:]
+            del scores[mode]['top'][5:]
 
-    def process(self,
-                context: game_state.StateHandlerContext) \
-            -> game_state.GameState:
-        super().process(context)
+            data['scores'] = scores
 
-        window = context.get_window()
+    def uses_dirty_rects(self) -> bool:
+        # The results don't change while they are being displayed, so they
+        # only have to be drawn once.
+        return True
 
-        window.fill((100, 100, 100))
+    def is_idle(self, context: game_state.StateHandlerContext) -> bool:
+        # The results are final; only a button click changes anything.
+        return True
 
-        window.blit(self._border_image, (0, 0))
+    def get_event_types(self) -> tuple[int]:
+        return Button.EVENT_TYPES
 
-        reset_button = Button(125, 300, self._button, "RESET")
-        back_button = Button(350, 300, self._button, "BACK")
-        quit_button = Button(575, 300, self._button, "QUIT")
+    def _draw(self, window):
+        self._widgets.blit(window)
+        self._results.blit(window)
 
-        buttons = [reset_button, back_button, quit_button]
-
-        gameover = self._title_font.render("GAME OVER", True, "white")
-
-        end_message = self._font.render(str(context.get_storage()['end_game']),
-                                        True, "white")
-        if context.get_storage()['difficulty'] == "infinite":
-            time = self._font.render("Time: " + str(
-                round(context.get_storage()['last_play_time'], 2)) +
-                                     "s", True, "white")
-            score = self._font.render(
-                "Score: " + str(context.get_storage()['last_score']), True,
-                "white")
+    def _build_results(self, context: StateHandlerContext) -> WidgetGroup:
+        storage = context.get_storage()
+        center = context.get_window().get_width() / 2
+
+        results = WidgetGroup()
+        results.add(Label(center, 150, 50, str(storage['end_game'])))
+        if storage['difficulty'] == "infinite":
+            results.add(Label(center, 200, 50,
+                              "Score: " + str(storage['last_score'])))
+            time = "Time: " + str(round(storage['last_play_time'], 2)) + "s"
         else:
-            if context.get_storage()['last_play_time'] > 0:
-                time = self._font.render("Time remaining: " + str(
-                    round(context.get_storage()['last_play_time'], 2)) +
-                                         "s", True, "white")
+            if storage['last_play_time'] > 0:
+                time = "Time remaining: " + str(
+                    round(storage['last_play_time'], 2)) + "s"
             else:
-                time = self._font.render(
-                    "Time remaining: " + str(round(0, 2)) + "s", True, "white")
-
-        for button in buttons:
-            button.blit(window)
-
-        clicked_buttons = []
+                time = "Time remaining: " + str(round(0, 2)) + "s"
+        results.add(Label(center, 250, 50, time))
+        return results
 
-        window.blit(gameover, (((window.get_width() / 2) -
-                                (gameover.get_width() / 2)), 75))
-
-        window.blit(end_message,
-                    ((window.get_width() - end_message.get_width()) / 2, 150))
-        if context.get_storage()['difficulty'] == "infinite":
-            window.blit(score,
-                        ((window.get_width() - score.get_width()) / 2, 200))
-        window.blit(time, ((window.get_width() - time.get_width()) / 2, 250))
+    def process(self,
+                context: game_state.StateHandlerContext) \
+            -> game_state.GameState:
+        super().process(context)
 
-        # Dispatch all events to all buttons
-        for event in context.get_events():
-            for button in buttons:
-                if button.dispatch_event(event):
-                    clicked_buttons.append(button)
+        if context.needs_redraw():
+            self._layer.blit(context.get_window())
 
         # Handle buttons that were clicked
-        for button in clicked_buttons:
-            if button == quit_button:
+        for button in self._widgets.dispatch_events(context.get_events()):
+            if button == self._quit_button:
                 return game_state.GameState.GAME_QUIT
-            elif button == back_button:
+            elif button == self._back_button:
                 return game_state.GameState.MAIN_MENU
-            elif button == reset_button:
+            elif button == self._reset_button:
                 return game_state.GameState.LEVEL_PLAY
 
         next_state = game_state.GameState.LEVEL_END
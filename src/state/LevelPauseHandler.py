@@ -3,68 +3,98 @@ This handler handles the `LEVEL_PAUSE` state, which is invoked by the user
 during game play and allows the user to pause the state of the game. This
 handler specifically displays the pause screen and allows the user to resume
 or abort the current level.
+
+The pause screen is an overlay: the level stays suspended underneath it, and
+the pause menu is drawn over a dimmed copy of the last frame of the level.
 """
 import pygame
 
 import game_state
 from arg import load_asset
-from state.MainMenuHandler import Button
+from widget import Button, Image, Label, StaticLayer, WidgetGroup
 
 
 class LevelPauseHandler(game_state.StateHandler):
     def __init__(self, context: game_state.StateHandlerContext):
         super().__init__(context)
-        self._title_font = pygame.font.SysFont("consolas", 80)
-
-        self._border_image = load_asset('menu_border.png')
-        self._button = load_asset('button.png')
 
         window = context.get_window()
-        width = window.get_width()
-        height = window.get_height()
 
-        self._border_image = pygame.transform.scale(self._border_image,
-                                                    (width, height))
+        self._border_image = load_asset('menu_border.png', window.get_size())
+        self._button = load_asset('button.png', Button.SIZE)
 
-    def process(self, context: game_state.StateHandlerContext) \
-            -> game_state.GameState:
-        super().process(context)
+        self._widgets = None
+        self._frozen = None
 
-        window = context.get_window()
+    def is_overlay(self) -> bool:
+        return True
+
+    def on_enter(self, context: game_state.StateHandlerContext) -> None:
+        super().on_enter(context)
+
+        # The level doesn't move on while it is paused.
+        context.get_clock().pause()
+
+        # The menu never changes, so it is only ever built once.
+        if self._widgets is None:
+            window = context.get_window()
 
-        resume_button = Button(125, 300, self._button, "RESUME")
-        back_button = Button(350, 300, self._button, "BACK")
-        quit_button = Button(575, 300, self._button, "QUIT")
-        buttons = [resume_button, back_button, quit_button]
+            self._widgets = WidgetGroup(self._button)
+            self._widgets.add(Image(0, 0, self._border_image))
+            self._resume_button = self._widgets.add_button(125, 300,
+                                                           "RESUME")
+            self._back_button = self._widgets.add_button(350, 300, "BACK")
+            self._quit_button = self._widgets.add_button(575, 300, "QUIT")
+            # antialias makes text look better
+            self._widgets.add(Label(window.get_width() / 2, 75, 80, "PAUSED"))
+            self._layer = StaticLayer(self._draw)
 
-        window.fill((100, 100, 100))
-        window.blit(self._border_image, (0, 0))
+        # The window still holds the last frame of the level, which is
+        # captured and dimmed once, and then drawn under the menu for as
+        # long as the game is paused.
+        self._frozen = context.get_window().copy()
+        self._frozen.fill((100, 100, 100), special_flags=pygame.BLEND_RGB_MULT)
+        self._layer.invalidate()
+        self._layer.prepare(context.get_window().get_size())
 
-        # antialias makes text look better
-        pause_info = self._title_font.render(
-            "PAUSED", True, "white")
+    def _draw(self, window):
+        window.blit(self._frozen, (0, 0))
+        self._widgets.blit(window)
 
-        for button in buttons:
-            button.blit(window)
+    def uses_dirty_rects(self) -> bool:
+        # Nothing on this screen moves, so it only has to be drawn once.
+        return True
 
-        clicked_buttons = []
-        window.blit(pause_info,
-                    ((window.get_width() - pause_info.get_width()) / 2, 75))
+    def is_idle(self, context: game_state.StateHandlerContext) -> bool:
+        # The level is frozen, so there is nothing to animate.
+        return True
 
-        # Dispatch all events to all buttons
-        for event in context.get_events():
-            for button in buttons:
-                if button.dispatch_event(event):
-                    clicked_buttons.append(button)
+    def get_event_types(self) -> tuple[int]:
+        return Button.EVENT_TYPES
+
+    def process(self, context: game_state.StateHandlerContext) \
+            -> game_state.GameState:
+        super().process(context)
+
+        window = context.get_window()
+
+        if context.needs_redraw():
+            self._layer.blit(window)
 
         # Handle buttons that were clicked
-        for button in clicked_buttons:
-            if button == quit_button:
+        for button in self._widgets.dispatch_events(context.get_events()):
+            if button == self._quit_button:
                 return game_state.GameState.GAME_QUIT
-            elif button == resume_button:
+            elif button == self._resume_button:
                 return game_state.GameState.LEVEL_PLAY
-            elif button == back_button:
+            elif button == self._back_button:
                 context.get_storage()["reset"] = True
                 return game_state.GameState.MAIN_MENU
 
         return game_state.GameState.LEVEL_PAUSE
+
+    def on_exit(self, context: game_state.StateHandlerContext) -> None:
+        super().on_exit(context)
+
+        context.get_clock().resume()
+        self._frozen = None
@@ -10,11 +10,49 @@ import pygame
 import pygame_gui
 import os
 
-from pygame import mixer
-from src import arithmetic
-from src import game_state
+import adaptive
+import answer_matcher
+import asset_cache
+import collision
+import expression
+import game_state
+import problem_queue
+import sound_bank
+from hud import GlyphAtlas
+from obstacle import ObstacleManager
+from scroller import ParallaxScroller
+import text_cache
+import user_data
 from arg import load_asset
 
+TICK = 1 / 60
+"""The length of a single step of the game simulation, in seconds. All
+speeds in the level are in pixels per step, regardless of the frame rate."""
+
+MAX_DELTA = 0.25
+"""The most time that is simulated in a single frame. If a frame takes longer
+than this, the game slows down instead of taking ever longer to catch up."""
+
+GAPS = {
+    "easy": (900, 1600),
+    "medium": (700, 1300),
+    "hard": (450, 900),
+    "infinite": (450, 900),
+    "card": (1750, 2150),
+}
+"""The range of distances between the left edges of one obstacle and the
+next, in pixels, at each difficulty, and with flash cards, which take longer
+to type. On top of this, obstacles are spread out by `GAP_TIME`."""
+
+GAP_TIME = 0.75
+"""How many seconds of running at the current speed are added to the
+distance between obstacles, so that the game keeps leaving time to answer
+no matter how fast it gets."""
+
+OBSTACLE_SIZES = [(50, 125), (36, 90)]
+"""The sizes of the kinds of obstacles, the first of which is the largest.
+All of them are the same calculator."""
+
 
 def _get_cards():
     path = os.path.join("assets", "flashcards.txt")
@@ -33,91 +71,155 @@ def _get_cards():
     return cards
 
 
+class LevelResources:
+    """
+    Everything the level loads from disk or builds up front: the images,
+    the character's mask, the glyph atlas for the readouts, and the flash
+    cards. These never change from one run of the level to the next, so
+    they are created only once and kept for as long as the game runs.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.cards = _get_cards()
+        # Indexed copies of the cards, so that the current card can be
+        # looked up without copying them every frame
+        self.questions = list(self.cards)
+        self.answers = list(self.cards.values())
+
+        self.font_size = 20
+        # The readouts change every frame, so they are drawn glyph by glyph
+        # from an atlas instead of being rendered.
+        self.hud = GlyphAtlas(self.font_size, labels=[
+            "Press SPACEBAR To Pause", "SCORE: ", "Time in game: ",
+            "Time remaining: "])
+
+        self.background_night = load_asset(
+            'night.jpg', (width, height), alpha=False)
+        self.background_day = load_asset(
+            "day.jpg", (width, height), alpha=False)
+
+        # Scale character. Its bounding box extends out into space, so
+        # collisions are checked against its mask instead to avoid ghost
+        # hits.
+        character = load_asset('Arithman.png')
+        self.character = load_asset(
+            'Arithman.png',
+            (int(character.get_width() * 0.4),
+             int(character.get_height() * 0.4)))
+        self.character_mask = collision.get_mask(self.character)
+
+        self.obstacles = [load_asset("calculator1.png", size)
+                          for size in OBSTACLE_SIZES]
+
+    @staticmethod
+    def preload(width: int, height: int) -> None:
+        """
+        Start decoding the images that the level needs in the background,
+        which takes most of the time it takes to construct the resources.
+        """
+        asset_cache.get().preload([
+            ('night.jpg', (width, height), False),
+            ('day.jpg', (width, height), False),
+            ('Arithman.png', None, True),
+        ] + [('calculator1.png', size, True) for size in OBSTACLE_SIZES])
+
+
 class LevelPlayHandler(game_state.StateHandler):
     def __init__(self, context: game_state.StateHandlerContext):
         super().__init__(context)
-        self._qa = _get_cards()
+        self._window = context.get_window()
+        self._width = self._window.get_width()
+        self._height = self._window.get_height()
+        self._resources = LevelResources(self._width, self._height)
+        resources = self._resources
+
+        self._questions = resources.questions
+        self._answers = resources.answers
+        self._qa_cnt = len(self._questions)  # total count of QAs
+        self._font_size = resources.font_size
+        self._hud = resources.hud
+        self._image_character = resources.character
+        self._mask_character = resources.character_mask
+        self._obstacle_images = resources.obstacles
+
+        # The background is two screens of day followed by two screens of
+        # night, over and over again.
+        self._scroller = ParallaxScroller()
+        self._scroller.add_layer([resources.background_day,
+                                  resources.background_day,
+                                  resources.background_night,
+                                  resources.background_night])
+        self._obstacles = ObstacleManager()
+
+        self._ground = 330
+        # Obstacles of every kind stand on the same ground.
+        self._obstacle_bottom = self._ground + OBSTACLE_SIZES[0][1]
+        self._jump_speed = 3
+        self._next_jump = -490
+        self._gravity = 750
+        self._stickman = pygame.Rect(0, self._ground,
+                                     self._image_character.get_width(),
+                                     self._image_character.get_height())
+        self._previous_rect = self._stickman.copy()
         self._order = []
-        self._qa_cnt = len(self._qa.keys())  # total count of QAs
+        self._user_input = None
+
+        # How well the player does at each kind of problem carries over from
+        # earlier sessions.
+        self._skills = adaptive.SkillModel.from_dict(
+            user_data.get().snapshot().get('skills') or {})
+        self._skills_changed = False
+
+        self.reset(context)
+
+    @classmethod
+    def is_ready(cls) -> bool:
+        # Constructing the level while its images are still being decoded
+        # would have to wait for them.
+        return not asset_cache.get().is_preloading()
+
+    def reset(self, context: game_state.StateHandlerContext) -> None:
+        """
+        Put the level back to where it starts, so that the next run of it
+        begins from the beginning instead of where the last one left off.
+        Nothing is loaded here, so this is cheap enough to do on every
+        restart.
+        """
+        self._order[:] = random.sample(range(self._qa_cnt), self._qa_cnt)
         self._qa_num = 0  # number of current QA
-        for _ in range(len(self._qa.keys())):
-            i = random.randrange(self._qa_cnt)
-            while i in self._order:
-                i = random.randrange(len(self._qa.keys()))
-            self._order.append(i)
         self._equation = None
-        self._font_size = 20
+        # The category of the adaptive problem being asked, if any
+        self._category = None
+        self._asked_at = 0.0
         self._score = 0
-        self._image_background_night = load_asset('night.jpg')
-        self._image_background_day = load_asset("day.jpg")
-        self._image_character = load_asset('Arithman.png')
-        self._obstacle_image = load_asset("calculator1.png")
-        self._obstacle_width = 50
-        self._obstacle_height = 125
-        self._clock = pygame.time.Clock()
         self._time = 0  # start stopwatch at 0
         self._countdown_time = 45  # 45 seconds
-        self._font = pygame.font.SysFont("consolas", self._font_size)
 
         self._speed = 2
         self._temp_speed = self._speed
-        self._jump_speed = 3
         self._jumping = False
         self._scored = True
+        # Where the right edge of the obstacle that the player jumped over
+        # last is, in the same units as `_distance_covered`
+        self._cleared = 0
 
-        self._window = context.get_window()
-        self._width = self._window.get_width()
-        self._height = self._window.get_height()
-        self._image_background_night = (
-            pygame.transform.scale(self._image_background_night,
-                                   (self._width, self._height)))
-
-        # pos of initial night background
-        self._image_background_night_pos1 = pygame.Rect(self._width * 2, 0,
-                                                        self._width,
-                                                        self._height)
-        # pos of init night img
-        self._image_background_night_pos2 = pygame.Rect(self._width * 3, 0,
-                                                        self._width,
-                                                        self._height)
-
-        self._image_background_day = pygame.transform.scale(
-            self._image_background_day, (self._width, self._height))
-        # pos init day image
-        self._image_background_day_pos1 = pygame.Rect(0, 0,
-                                                      self._width,
-                                                      self._height)
-        # pos init day image
-        self._image_background_day_pos2 = pygame.Rect(self._width, 0,
-                                                      self._width,
-                                                      self._height)
+        self._scroller.set_offset(0)
         # position of end of level for easy, medium, and hard difficulties
         self._end = 12000
-
-        # Scale character, then crop it so that the bounding box doesn't extend
-        # out into space, thus creating ghost hits.
-        self._image_character = pygame.transform.scale_by(
-            self._image_character,
-            0.4)
-
         self._distance_covered = 0
-        self._user_input = None
 
-        self._ground = 330
         self._jump = 0
-        self._next_jump = -490
-        self._gravity = 750
-        self._stickman = pygame.Rect(0, self._ground,
-                                     self._image_character.get_width(),
-                                     self._image_character.get_height())
-
-        self._obstacle_y = self._ground
-        self._obstacle_image = pygame.transform.scale(
-            self._obstacle_image,
-            (self._obstacle_width, self._obstacle_height))
-        self._obstacle_hitbox = pygame.Rect(950, self._obstacle_y,
-                                            self._obstacle_width,
-                                            self._obstacle_height)
+        self._stickman.topleft = (0, self._ground)
+        self._stickman.centerx = self._width // 2
+        self._previous_y = self._stickman.y
+        self._previous_rect.update(self._stickman)
+        # Time that has passed but hasn't been simulated yet
+        self._accumulator = 0.0
+
+        # The obstacles of the last run go back into the manager's pool, so
+        # restarting doesn't allocate any new ones. New ones are spawned as
+        # soon as the level knows its difficulty.
+        self._obstacles.clear()
         context.get_storage()["reset"] = False
 
     def on_enter(self, context: game_state.StateHandlerContext) -> None:
@@ -126,7 +228,10 @@ class LevelPlayHandler(game_state.StateHandler):
         input_width = 100
         input_height = 50
         if context.get_storage()["reset"]:
-            self.__init__(context)
+            self.reset(context)
+        # Whatever was asked in a previous run is no longer being answered.
+        self._category = None
+        self._asked_at = 0.0
         if context.get_storage()['live_mode'] == "card":
             input_left = (window.get_width() - input_width) - 350
         else:
@@ -142,257 +247,286 @@ class LevelPlayHandler(game_state.StateHandler):
         self._user_input.placeholder_text = ""
         self._user_input.focus()
         if context.get_storage()['live_mode'] == "math":
-            if context.get_storage()['difficulty'] == "easy":
-                self._equation = arithmetic.generate_arithmetic("easy")
-            elif context.get_storage()['difficulty'] == "medium":
-                self._equation = arithmetic.generate_arithmetic("medium")
-            elif context.get_storage()['difficulty'] == "hard":
-                self._equation = arithmetic.generate_arithmetic("hard")
-            elif context.get_storage()['difficulty'] == "infinite":
+            if context.get_storage()['difficulty'] == "infinite":
                 self._scored = True
-                if self._score >= 10:
-                    self._equation = arithmetic.generate_arithmetic("hard")
-                elif self._score >= 5:
-                    self._equation = arithmetic.generate_arithmetic("medium")
-                else:
-                    self._equation = arithmetic.generate_arithmetic("easy")
+            self._next_problem(context)
         else:
             context.get_storage()['difficulty'] = "infinite"
+        self._expect_answer(context)
+        self._spawn_obstacles(context)
 
-        if self._time > 0:
-            self._time = context.get_storage()['last_play_time']
-        self._clock.tick(60) / 1000  # resets the tick
-
-    def _draw_scene(self, context):
-        dt = context.get_delta()
-
-        d1 = self._image_background_day_pos1.x
-        d2 = self._image_background_day_pos2.x
-        n1 = self._image_background_night_pos1.x
-        n2 = self._image_background_night_pos2.x
-
-        d1 -= self._speed
-        d2 -= self._speed
-        n1 -= self._speed
-        n2 -= self._speed
-
-        if context.get_storage()['difficulty'] == "easy" or \
-                context.get_storage()['difficulty'] == "medium" or \
-                context.get_storage()['difficulty'] == "hard":
-            self._end -= self._speed
-
-        if n2 <= 0:
-            d1 = n2 + self._width
-            d2 = d1 + self._width
-        if n2 <= -self._width:
-            n1 = d2 + self._width
-            n2 = n1 + self._width
-
-        self._image_background_day_pos1.update(d1, 0,
-                                               self._width, self._height)
-        self._window.blit(self._image_background_day,
-                          (d1, self._image_background_day.get_rect().y))
-        self._image_background_day_pos2.update(d2, 0,
-                                               self._width, self._height)
-        self._window.blit(self._image_background_day,
-                          (d2, self._image_background_day.get_rect().y))
-        self._image_background_night_pos1.update(n1, 0,
-                                                 self._width, self._height)
-        self._window.blit(self._image_background_night,
-                          (n1, self._image_background_night.get_rect().y))
-        self._image_background_night_pos2.update(n2, 0,
-                                                 self._width, self._height)
-        self._window.blit(self._image_background_night,
-                          (n2, self._image_background_night.get_rect().y))
-
-        obstacle = self._obstacle_hitbox.x
-        obstacle -= self._speed
-        self._obstacle_hitbox.update(obstacle, self._obstacle_y,
-                                     self._obstacle_width,
-                                     self._obstacle_height)
-        self._window.blit(self._obstacle_image, (obstacle, self._obstacle_y))
-
-        if obstacle < -51:
-            # makes the obstacle have a random position off-screen that the
-            # player has to overcome
-            if context.get_storage()['live_mode'] == "math":
-                self._obstacle_hitbox.update(random.randint(905, 1800),
-                                             self._obstacle_y,
-                                             self._obstacle_width,
-                                             self._obstacle_height)
+    def _spawn_obstacles(self, context):
+        # Keeps obstacles coming up to two screens ahead, each a random gap
+        # after the last, so that several of them are on their way at once.
+        if context.get_storage()['live_mode'] == "card":
+            low, high = GAPS["card"]
+        else:
+            low, high = GAPS[context.get_storage()['difficulty']]
+        # While jumping, the level is slowed down only for a moment.
+        speed = max(self._speed, self._temp_speed)
+        last = self._obstacles.last()
+        while last is None or last.rect.left < self._width * 2:
+            if last is None:
+                x = 950
             else:
-                self._obstacle_hitbox.update(random.randint(1700, 2100),
-                                             self._obstacle_y,
-                                             self._obstacle_width,
-                                             self._obstacle_height)
-
-        if self._countdown_time == 120 and self._time == 0:
-            self._clock.tick(60) / 1000  # resets the tick
-        # stopwatch
-        if context.get_storage()['difficulty'] == "infinite":
-            self._time += self._clock.tick(60) / 1000
+                x = (last.rect.left + random.randint(low, high)
+                     + round(speed * GAP_TIME / TICK))
+            image = random.choice(self._obstacle_images)
+            last = self._obstacles.spawn(
+                image, x, self._obstacle_bottom - image.get_height())
+
+    def _next_problem(self, context):
+        difficulty = context.get_storage()['difficulty']
+        # Either way, the problem itself was generated ahead of time.
+        if difficulty == "infinite":
+            # Infinite mode asks whatever the player is ready for next.
+            self._category = self._skills.choose()
+            self._equation = problem_queue.get().pop(
+                adaptive.get_key(self._category))
         else:
-            # countdown
-            self._countdown_time -= self._clock.tick(60) / 1000
+            self._category = None
+            self._equation = problem_queue.get().pop(difficulty)
+        self._asked_at = context.get_clock().get_game_time()
+
+    def _answered(self, context, correct):
+        # Only the first correct answer to each problem counts, and time
+        # spent paused doesn't count towards how long it took.
+        if self._category is None:
+            return
+        latency = context.get_clock().get_game_time() - self._asked_at
+        self._skills.record(self._category, correct, latency)
+        self._skills_changed = True
+        if correct:
+            self._category = None
+
+    def _expect_answer(self, context):
+        # Tell the matcher which answer to look for as the player types.
+        if context.get_storage()['live_mode'] == "math":
+            answer_matcher.get().set_answer(self._equation[1])
+        else:
+            answer_matcher.get().set_answer(
+                self._answers[self._order[self._qa_num]])
+
+    def _draw_scene(self, context, alpha):
+        self._scroller.draw(self._window, alpha)
+        self._obstacles.draw(self._window, alpha)
 
     def _draw_ui(self, context):
         window = context.get_window()
-        # antialias makes text look better
-        pause_info = self._font.render(
-            "Press SPACEBAR To Pause", True, "white")
-        score_info = self._font.render(
-            "SCORE: " + str(self._score), True, "white")
-        # stopwatch
-        time_info = self._font.render(f"Time in game: {self._time:.2f}s", True,
-                                      "white")
-        # countdown
-        countdown_info = self._font.render(
-            f"Time remaining: {self._countdown_time:.2f}s", True, "white")
+        text = text_cache.get()
+        hud = self._hud
 
         # set pause_info text on top right with 5x5 px padding
-        window.blit(pause_info,
-                    (window.get_width() - pause_info.get_width() - 5, 5))
+        pause_info = "Press SPACEBAR To Pause"
+        hud.draw(window, pause_info,
+                 (window.get_width() - hud.get_width(pause_info) - 5, 5))
         if context.get_storage()['difficulty'] == "infinite":
-            window.blit(score_info, (350, 5))
+            x = hud.draw(window, "SCORE: ", (350, 5))
+            hud.draw(window, str(self._score), (x, 5))
             # stopwatch
-            window.blit(time_info, (5, 5))
+            x = hud.draw(window, "Time in game: ", (5, 5))
+            hud.draw(window, f"{self._time:.2f}s", (x, 5))
         else:
             # countdown
-            window.blit(countdown_info, (5, 5))
+            x = hud.draw(window, "Time remaining: ", (5, 5))
+            hud.draw(window, f"{self._countdown_time:.2f}s", (x, 5))
         if context.get_storage()['live_mode'] == "math":
-            equation = self._font.render(self._equation[0] + ' = ', True,
-                                         "white")
+            equation = text.render(self._equation[0] + ' = ',
+                                   self._font_size)
             window.blit(equation,
                         ((window.get_width() - equation.get_width()) / 3, 450))
         else:
-            question = self._font.render(
-                list(self._qa)[self._order[self._qa_num]] + " ->", True,
-                "white")
-            # num_chars = len(list(self._qa)[self._order[self._qa_num]])
+            question = text.render(
+                self._questions[self._order[self._qa_num]] + " ->",
+                self._font_size)
             window.blit(question,
                         ((window.get_width() - question.get_width() * 2) / 3,
                          450))
 
-    def _draw_character(self, context):
+    def _draw_character(self, context, alpha):
         window = context.get_window()
-        dt = context.get_delta()
 
-        # Character is always centered on the screen
-        self._stickman.x = (window.get_width() -
-                            self._image_character.get_width()) / 2
+        # displays the character between where it was on the last two steps
+        y = self._previous_y + (self._stickman.y - self._previous_y) * alpha
+        window.blit(self._image_character, (self._stickman.x, y))
 
-        self._stickman.y += self._jump * dt
-        self._jump += self._gravity * dt
+    def _upcoming(self, x):
+        # The next obstacle at or after the screen coordinate `x`, leaving
+        # out the one that was just jumped over, which is still under the
+        # player for a while after it has scored.
+        cleared = self._cleared - self._distance_covered
+        return self._obstacles.upcoming(max(x, cleared + 1))
 
-        if self._stickman.y > self._ground:
-            self._stickman.y = self._ground
-            self._jump = 0
+    def update(self, context: game_state.StateHandlerContext) \
+            -> game_state.GameState:
+        """
+        Advance the level by exactly one fixed time step of `TICK` seconds.
+        All game logic happens here, so the game plays the same no matter
+        how many frames per second are actually drawn. Returns the state
+        that the game should be in after this step.
+        """
+        next_state = game_state.GameState.LEVEL_PLAY
 
-        # displays the character at a position
-        window.blit(self._image_character,
-                    (self._stickman.x, self._stickman.y))
+        # The timers count simulated time, so they can never drift from
+        # the game itself.
+        if context.get_storage()['difficulty'] == "infinite":
+            # stopwatch
+            self._time += TICK
+        else:
+            # countdown
+            self._countdown_time -= TICK
 
-    def process(self, context: game_state.StateHandlerContext) \
-            -> game_state.GameState:
-        super().process(context)
+        # How far the level scrolls in this step. Once the player has
+        # answered, a step never goes past the start of the jump window,
+        # which is only 50 pixels wide, so that even at speeds where a
+        # single step is longer than that, the jump starts before the
+        # obstacle gets to the player.
+        distance = self._speed
+        if self._jumping:
+            obstacle = self._upcoming(self._stickman.left).rect
+            distance = min(distance,
+                           max(obstacle.left - 50 - self._stickman.right, 0))
 
-        self._draw_scene(context)
-        self._draw_character(context)
-        self._draw_ui(context)
+        self._scroller.scroll(distance)
 
-        next_state = game_state.GameState.LEVEL_PLAY
-        window = context.get_window()
+        if context.get_storage()['difficulty'] == "easy" or \
+                context.get_storage()['difficulty'] == "medium" or \
+                context.get_storage()['difficulty'] == "hard":
+            self._end -= distance
 
-        # game ends when countdown hits 0
-        if self._countdown_time <= 0:
-            next_state = game_state.GameState.LEVEL_END
+        # Obstacles that scrolled off the screen are recycled, and new ones
+        # take their place off-screen to the right.
+        self._obstacles.scroll(distance, -51)
+        self._spawn_obstacles(context)
+
+        # Where the player was at the end of the last step
+        previous = self._previous_rect
+        previous.update(self._stickman)
+        self._previous_y = self._stickman.y
+
+        self._stickman.y += self._jump * TICK
+        self._jump += self._gravity * TICK
+
+        if self._stickman.y > self._ground:
+            self._stickman.y = self._ground
+            self._jump = 0
 
-        self._distance_covered += self._speed
+        self._distance_covered += distance
+
+        # The obstacle the player has to get over next. At high speeds it
+        # can scroll past the whole jump window in a single step, so the
+        # window stays open as long as the obstacle hadn't passed the player
+        # at the start of the step.
+        obstacle = self._upcoming(self._stickman.left - distance).rect
 
         if (
                 self._jumping and
-                self._stickman.right >= self._obstacle_hitbox.left - 50
-                and not self._stickman.left > self._obstacle_hitbox.right):
-            self._temp_speed = self._speed
+                self._stickman.right >= obstacle.left - 50):
+            if self._scored:
+                # Jumping again before landing keeps the speed from before
+                # the first jump.
+                self._temp_speed = self._speed
             self._speed = self._jump_speed
             self._jump = self._next_jump
             self._jumping = False
             self._scored = False
-            path = os.path.join("music", "jump.mp3")
-            jump_sound = pygame.mixer.Sound(path)
-            jump_sound.set_volume(0.5)
-            jump_sound.play()
-
-        if (not self._scored
-                and self._stickman.right >= self._obstacle_hitbox.right + 50):
+            self._cleared = self._distance_covered + obstacle.right
+            sound_bank.get().play("jump.mp3")
+            answer_matcher.get().jumped()
+        elif self._jumping:
+            # The answer came in before the obstacle was close enough to
+            # jump over, so only the player's timing is left to measure.
+            answer_matcher.get().discard()
+
+        # It counts once it is 50 pixels behind the player.
+        if (not self._scored and self._distance_covered
+                >= self._cleared + 50 - self._stickman.right):
             if context.get_storage()['difficulty'] != "infinite":
                 self._speed = self._temp_speed + 2
             else:
                 self._score += 1
                 self._speed = self._temp_speed + 1
             if context.get_storage()['live_mode'] == "math":
-                if (self._score >= 10
-                        or context.get_storage()['difficulty'] == "hard"):
-                    self._equation = arithmetic.generate_arithmetic("hard")
-                elif (self._score >= 5
-                      or context.get_storage()['difficulty'] == "medium"):
-                    self._equation = arithmetic.generate_arithmetic("medium")
-                else:
-                    self._equation = arithmetic.generate_arithmetic("easy")
+                self._next_problem(context)
             else:
                 if self._qa_num < self._qa_cnt - 1:
                     self._qa_num += 1
                 else:
                     self._qa_num = 0
-                    del self._order[:]  # reset question order
-                    for _ in range(
-                            len(self._qa.keys())):  # re-shuffle questions
-                        i = random.randrange(self._qa_cnt)
-                        while i in self._order:
-                            i = random.randrange(len(self._qa.keys()))
-                        self._order.append(i)
+                    # re-shuffle questions
+                    self._order[:] = random.sample(range(self._qa_cnt),
+                                                   self._qa_cnt)
             self._scored = True
+            self._expect_answer(context)
+
+        if self._obstacles.sweep(previous, self._stickman,
+                                 self._mask_character) is not None:
+            sound_bank.get().play("game_over.mp3")
+
+            next_state = game_state.GameState.LEVEL_END
+            if context.get_storage()['difficulty'] == "infinite":
+                context.get_storage()['end_game'] = "Nice Run!"
+            else:
+                context.get_storage()['end_game'] = "You Lose."
+        elif context.get_storage()["live_mode"] == "math":
+            # Reaching the end in the same step as running into an obstacle
+            # still loses.
+            if self._end <= self._stickman.right:
+                next_state = game_state.GameState.LEVEL_END
+                context.get_storage()['end_game'] = "You Win!"
+
+        return next_state
+
+    def process(self, context: game_state.StateHandlerContext) \
+            -> game_state.GameState:
+        super().process(context)
+
+        next_state = game_state.GameState.LEVEL_PLAY
 
         # check if player presses enter in text box
         for event in context.get_events():
             if (event.type == pygame_gui.UI_TEXT_ENTRY_FINISHED and
                     event.ui_object_id == "answer_input_box"):
+                if not event.text:
+                    # An answer that was already picked up while it was
+                    # typed cleared the box, so pressing Enter out of habit
+                    # afterwards shouldn't count as a wrong answer.
+                    continue
                 if context.get_storage()['live_mode'] == "math":
-                    try:
-                        # checks if answer is correct
-                        if float(event.text) == self._equation[1]:
-                            self._jumping = True
-                        else:
-                            self._jumping = False
-                            difficulty = context.get_storage()['difficulty']
-                            if difficulty != "infinite":
-                                self._speed = 2
-
-                    except ValueError:
-                        # In infinite mode, if the user inputs an invalid
-                        # number, just clear the box. In easy, medium,
-                        # and hard modes the speed is set to 2 if number is
-                        # inputted wrong.
-                        if context.get_storage()["difficulty"] != "infinite":
-                            self._speed = 2
+                    # checks if answer is correct. It is compared exactly,
+                    # and can also be typed in as a fraction, like 3/4.
+                    if expression.check_answer(event.text,
+                                               self._equation[1]):
+                        self._jumping = True
+                        answer_matcher.get().accept()
+                        self._answered(context, True)
+                    else:
+                        self._answered(context, False)
+                        # In infinite mode, if the user inputs a wrong or
+                        # invalid number, just clear the box. In easy,
+                        # medium, and hard modes the speed is set to 2 if
+                        # number is inputted wrong.
                         self._jumping = False
+                        difficulty = context.get_storage()['difficulty']
+                        if difficulty != "infinite":
+                            self._speed = 2
                 else:
-                    try:
-                        # checks if answer is correct
-                        qa_ans = list(
-                            self._qa.values())[self._order[self._qa_num]]
-                        if str(event.text).lower() == qa_ans:
-                            self._jumping = True
-                        else:
-                            self._jumping = False
-
-                    except ValueError:
-                        # If the user inputs an invalid answer, clear
-                        # the box and stop from jumping.
-                        self._jumping = False
-                        pass
+                    # checks if answer is correct, by the same rule as while
+                    # typing, which ignores case and surrounding whitespace.
+                    self._jumping = answer_matcher.get().match(event.text)
 
                 self._user_input.set_text("")  # reset textbox
+            elif (event.type == pygame_gui.UI_TEXT_ENTRY_CHANGED and
+                  event.ui_object_id == "answer_input_box"):
+                # The answer counts as soon as it has been typed in, without
+                # waiting for Enter.
+                if answer_matcher.get().match(event.text):
+                    self._jumping = True
+                    if context.get_storage()['live_mode'] == "math":
+                        self._answered(context, True)
+                    self._user_input.set_text("")
+            elif event.type == pygame.KEYDOWN:
+                answer_matcher.get().press()
             elif ((event.type == pygame.KEYUP and
                    event.__dict__['key'] == pygame.K_SPACE) or
                   event.type == pygame.WINDOWLEAVE):
@@ -400,30 +534,30 @@ class LevelPlayHandler(game_state.StateHandler):
                 # go to the pause state.
                 next_state = game_state.GameState.LEVEL_PAUSE
 
-        if (self._stickman.right > self._obstacle_hitbox.left and
-                self._stickman.left < self._obstacle_hitbox.right):
-            if self._obstacle_hitbox.top <= self._stickman.bottom:
-                path = os.path.join("music", "game_over.mp3")
-                game_over_sound = pygame.mixer.Sound(path)
-                game_over_sound.set_volume(0.5)
-                game_over_sound.play()
-
-                next_state = game_state.GameState.LEVEL_END
-                if context.get_storage()['difficulty'] == "infinite":
-                    context.get_storage()['end_game'] = "Nice Run!"
-                else:
-                    context.get_storage()['end_game'] = "You Lose."
+        # Run as many fixed steps as fit into the game time that has passed,
+        # carrying the rest over to the next frame. After a long stall, the
+        # game skips ahead instead of trying to catch up all at once.
+        delta = context.get_clock().get_game_delta()
+        self._accumulator += min(delta, MAX_DELTA)
+        while (self._accumulator >= TICK
+               and next_state == game_state.GameState.LEVEL_PLAY):
+            next_state = self.update(context)
+            self._accumulator -= TICK
+
+        # Draw everything in between the last two steps, according to how
+        # far the leftover time is into the next step.
+        alpha = min(self._accumulator / TICK, 1.0)
+        self._draw_scene(context, alpha)
+        self._draw_character(context, alpha)
+        self._draw_ui(context)
 
-        if context.get_storage()["live_mode"] == "math":
-            if self._end <= self._stickman.right:
-                next_state = game_state.GameState.LEVEL_END
-                context.get_storage()['end_game'] = "You Win!"
-            elif (context.get_storage()['difficulty'] != "infinite"
-                  and self._countdown_time <= 0):
-                path = os.path.join("music", "game_over.mp3")
-                game_over_sound = pygame.mixer.Sound(path)
-                game_over_sound.set_volume(0.5)
-                game_over_sound.play()
+        # game ends when countdown hits 0
+        if self._countdown_time <= 0:
+            next_state = game_state.GameState.LEVEL_END
+            if (context.get_storage()["live_mode"] == "math"
+                    and context.get_storage()['difficulty'] != "infinite"
+                    and self._end > self._stickman.right):
+                sound_bank.get().play("game_over.mp3")
                 context.get_storage()['end_game'] = "You Lose."
 
         return next_state
@@ -437,24 +571,34 @@ class LevelPlayHandler(game_state.StateHandler):
         else:
             context.get_storage()['last_play_time'] = self._countdown_time
 
+        if (context.get_state() == game_state.GameState.LEVEL_END
+                and self._category is not None):
+            # Running into the obstacle without ever answering is the most
+            # common way to get a problem wrong, so it counts as a miss.
+            self._answered(context, False)
+
+        if self._skills_changed:
+            user_data.get()['skills'] = self._skills.to_dict()
+            self._skills_changed = False
+
         if context.get_state() == game_state.GameState.LEVEL_END:
             # The game has ended; reset all state so that when we are
             # re-started, we start from the beginning and not where we left
             # off.
-            #
-            # TODO: We should probably see if Pygame requires us to clean up
-            # any resources (such as closing images) before we lose references
-            # to resources and thus leak them. For now, this probably isn't a
-            # problem because it's unlikely that the game will be played more
-            # than just a few times during each execution of the program, but
-            # this feels like a hack so it would be nice to know if there are
-            # any unintended side effects of this.
-            self.__init__(context)
-            pass
-        else:
-            # The game was just paused, don't reset the state.
-            context.get_storage()['last_play_time'] = self._time
-            # makes sure that the character doesn't jump when player resumes
-            # the game
-            self._jumping = False
-            pass
+            self.reset(context)
+
+    def on_suspend(self, context):
+        super().on_suspend(context)
+
+        # The game was just paused. The text box stays as it is, but it
+        # shouldn't show up on top of the pause screen.
+        self._user_input.hide()
+        # makes sure that the character doesn't jump when player resumes
+        # the game
+        self._jumping = False
+
+    def on_resume(self, context):
+        super().on_resume(context)
+
+        self._user_input.show()
+        self._user_input.focus()
@@ -2,112 +2,67 @@
 This handler handles the `MAIN_MENU` state. It displays the main menu and waits
 for the user to make a selection.
 """
-import pygame
 import game_state
 from arg import load_asset
-
-
-class Button:
-    """
-    A simple class that represents a Pygame button. Note that this class does
-    *not* use the Pygame GUI module; rather, it simply blits an image to the
-    window and monitors incoming events to know if that area was clicked. In
-    the future, this class may be a proper button class that takes button text
-    and color instead of an image.
-    """
-
-    def __init__(self, x, y, image, text):
-        """
-        Create a new Button using `image` as the background and `text` as the
-        text.
-        """
-        self._image = pygame.transform.scale(image, (200, 100))
-        self._rect = self._image.get_rect()
-        self._rect.topleft = (x, y)
-        self._clicked = False
-        self._button_font = pygame.font.SysFont("consolas", 50)
-        self._text = self._button_font.render(text, True, "white")
-
-    def blit(self, window):
-        """
-        Draw the button image on the screen.
-        """
-        window.blit(self._image, (self._rect.x, self._rect.y))
-        window.blit(self._text, (
-            self._rect.x + 100 - (self._text.get_width() / 2),
-            self._rect.y + 55 -
-            (self._text.get_height() / 2)))
-
-    def dispatch_event(self, event) -> bool:
-        """
-        Receive an event from the processor context and use it to determine
-        whether this button was clicked, returning `False` if this event does
-        not indicate a click of this button and `True` if it does.
-        """
-
-        # Only respond to mouse up events
-        if event.type == pygame.MOUSEBUTTONUP:
-            # Get mouse position when the event was fired.
-            # We don't want to use the current mouse position because it
-            # may have changed since the event was dispatched to us.
-            pos = event.__dict__['pos']
-
-            # If the click was inside our bounding box, this button was
-            # pressed.
-            return self._rect.collidepoint(pos)
-        # Not even a mouse up event, so this can't be a click
-        return False
+from widget import Button, Image, StaticLayer, WidgetGroup
 
 
 class MainMenuHandler(game_state.StateHandler):
     def __init__(self, context: game_state.StateHandlerContext):
         super().__init__(context)
 
-        self._image_border = load_asset('menu_border.png')
-        self._button = load_asset('button.png')
+        window = context.get_window()
+
+        self._image_border = load_asset('menu_border.png', window.get_size())
+        self._button = load_asset('button.png', Button.SIZE)
         self._logo = load_asset('Arithman Logo.png')
 
-        window = context.get_window()
-        width = window.get_width()
-        height = window.get_height()
+        self._widgets = None
 
-        self._image_border = pygame.transform.scale(
-            self._image_border, (width, height))
+    def on_enter(self, context: game_state.StateHandlerContext) -> None:
+        super().on_enter(context)
 
-    def process(self, context: game_state.StateHandlerContext) \
-            -> game_state.GameState:
-        super().process(context)
+        # The menu never changes, so it is only ever built once.
+        if self._widgets is None:
+            self._widgets = WidgetGroup(self._button)
+            self._widgets.add(Image(0, 0, self._image_border))
+            self._widgets.add(Image(200, 100, self._logo))
+            self._start_button = self._widgets.add_button(125, 300, "START")
+            self._score_button = self._widgets.add_button(350, 300, "SCORE")
+            self._quit_button = self._widgets.add_button(575, 300, "QUIT")
+            self._layer = StaticLayer(self._widgets.blit)
 
-        window = context.get_window()
+        # Composite the static layer now, so that drawing a frame costs a
+        # single blit.
+        self._layer.prepare(context.get_window().get_size())
 
-        # create button instances
-        start_button = Button(125, 300, self._button, "START")
-        score_button = Button(350, 300, self._button, "SCORE")
-        quit_button = Button(575, 300, self._button, "QUIT")
-        buttons = [start_button, score_button, quit_button]
+    def uses_dirty_rects(self) -> bool:
+        # Nothing on this screen moves, so it only has to be drawn once.
+        return True
 
-        window.fill((100, 100, 100))  # Gray
-        window.blit(self._image_border, (0, 0))
-        window.blit(self._logo, (200, 100))
+    def is_idle(self, context: game_state.StateHandlerContext) -> bool:
+        # The main menu can sit on screen for hours; don't spin while it does.
+        return True
 
-        for button in buttons:
-            button.blit(window)
+    def get_event_types(self) -> tuple[int]:
+        return Button.EVENT_TYPES
 
-        clicked_buttons = []
+    def process(self, context: game_state.StateHandlerContext) \
+            -> game_state.GameState:
+        super().process(context)
+
+        window = context.get_window()
 
-        # Dispatch all events to all buttons
-        for event in context.get_events():
-            for button in buttons:
-                if button.dispatch_event(event):
-                    clicked_buttons.append(button)
+        if context.needs_redraw():
+            self._layer.blit(window)
 
         # Handle buttons that were clicked
-        for button in clicked_buttons:
-            if button == quit_button:
+        for button in self._widgets.dispatch_events(context.get_events()):
+            if button == self._quit_button:
                 return game_state.GameState.GAME_QUIT
-            elif button == start_button:
+            elif button == self._start_button:
                 return game_state.GameState.GAME_MODE
-            elif button == score_button:
+            elif button == self._score_button:
                 return game_state.GameState.SCORE
 
         return game_state.GameState.MAIN_MENU
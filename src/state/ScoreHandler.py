@@ -9,8 +9,9 @@ import time
 
 import pygame
 
+import text_cache
 import user_data
-from state.MainMenuHandler import Button
+from widget import Button, Image, StaticLayer, WidgetGroup
 import game_state
 from arg import load_asset
 
@@ -19,17 +20,35 @@ class ScoreHandler(game_state.StateHandler):
     def __init__(self, context: game_state.StateHandlerContext):
         super().__init__(context)
 
-        self._image_border = load_asset('menu_border.png')
-        self._button = load_asset('button.png')
-
         window = context.get_window()
-        width = window.get_width()
-        height = window.get_height()
 
-        self._image_border = pygame.transform.scale(
-            self._image_border, (width, height))
+        self._image_border = load_asset('menu_border.png', window.get_size())
+        self._button = load_asset('button.png', Button.SIZE)
+
+        self._data = None
+
+        self._widgets = None
+
+    def on_enter(self, context: game_state.StateHandlerContext) -> None:
+        super().on_enter(context)
 
-        self._data = user_data.get().snapshot()
+        # The menu never changes, so it is only ever built once.
+        if self._widgets is None:
+            self._widgets = WidgetGroup(self._button)
+            self._widgets.add(Image(0, 0, self._image_border))
+            self._back_button = self._widgets.add_button(350, 345, "BACK")
+            self._layer = StaticLayer(self._draw)
+
+        # Only composite the scores again if they changed since the last time
+        # they were displayed. Scores are only ever replaced as a whole, so
+        # anything else in the user data, like skill ratings, can change
+        # without the scores being drawn again.
+        data = user_data.get().snapshot()
+        if self._data is None or (data.get('scores')
+                                  is not self._data.get('scores')):
+            self._data = data
+            self._layer.invalidate()
+        self._layer.prepare(context.get_window().get_size())
 
     @staticmethod
     def _cell(tot_width, n_cols, width, col=1, off=0):
@@ -43,21 +62,20 @@ class ScoreHandler(game_state.StateHandler):
         return lambda s: \
             (self._cell(frame_wid, 4, s.get_width(), type_col, frame_off), row)
 
-    def process(self, context: game_state.StateHandlerContext) \
-            -> game_state.GameState:
-        super().process(context)
-
-        window = context.get_window()
+    def uses_dirty_rects(self) -> bool:
+        # The scores don't change while they are being displayed, so they
+        # only have to be drawn once.
+        return True
 
-        # create button instances
-        back_button = Button(350, 345, self._button, "BACK")
-        buttons = [back_button]
+    def is_idle(self, context: game_state.StateHandlerContext) -> bool:
+        # Only a click on BACK changes anything here.
+        return True
 
-        window.fill((100, 100, 100))  # Gray
-        window.blit(self._image_border, (0, 0))
+    def get_event_types(self) -> tuple[int]:
+        return Button.EVENT_TYPES
 
-        for button in buttons:
-            button.blit(window)
+    def _draw(self, window: pygame.Surface):
+        self._widgets.blit(window)
 
         frame_off = 75
         frame_wid = window.get_width() - (2 * frame_off)
@@ -83,7 +101,7 @@ class ScoreHandler(game_state.StateHandler):
             [(100, 155), (window.get_width() - 100, 155)]
         ]
 
-        if self._data['scores']:
+        if self._data.get('scores'):
             lines.append(
                 [(window.get_width() / 2, 120), (window.get_width() / 2, 350)])
 
@@ -114,25 +132,24 @@ class ScoreHandler(game_state.StateHandler):
                  (lambda s:
                   (self._center(window.get_width(), s.get_width()), 270))])
 
+        text = text_cache.get()
         for string in strings:
-            font = pygame.font.SysFont('consolas', string[0])
-            rendered = font.render(string[1], True, 'white')
+            rendered = text.render(string[1], string[0])
             window.blit(rendered, string[2](rendered))
 
         for line in lines:
             pygame.draw.line(window, 'white', line[0], line[1])
 
-        clicked_buttons = []
+    def process(self, context: game_state.StateHandlerContext) \
+            -> game_state.GameState:
+        super().process(context)
 
-        # Dispatch all events to all buttons
-        for event in context.get_events():
-            for button in buttons:
-                if button.dispatch_event(event):
-                    clicked_buttons.append(button)
+        if context.needs_redraw():
+            self._layer.blit(context.get_window())
 
         # Handle buttons that were clicked
-        for button in clicked_buttons:
-            if button == back_button:
+        for button in self._widgets.dispatch_events(context.get_events()):
+            if button == self._back_button:
                 return game_state.GameState.MAIN_MENU
 
         return game_state.GameState.SCORE
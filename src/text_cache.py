@@ -0,0 +1,133 @@
+"""
+A cache for rendered text. Looking up a system font with
+`pygame.font.SysFont()` scans the fonts installed on the system, and
+rendering text allocates a brand new surface every single time, so neither
+should happen on every frame for text that doesn't change.
+
+The `TextCache` resolves each font family and size only once, and keeps
+rendered text surfaces in a least-recently-used cache that is bounded by a
+memory budget, so that text that is drawn over and over again is only
+rendered once.
+
+Note that you should use text_cache.get() to get the default instance of
+TextCache instead of instantiating it yourself. Also note that the surfaces
+handed out by the cache are shared, so they must never be drawn on.
+"""
+from collections import OrderedDict
+
+import pygame
+
+import log
+
+DEFAULT_FAMILY = "consolas"
+"""The font family used for all text in the game, unless otherwise noted."""
+
+
+class TextCache:
+    """
+    TextCache holds every font it has resolved, as well as the most recently
+    used text surfaces it has rendered, which are keyed by font, text,
+    antialiasing, and color. It also keeps statistics on how well the cache
+    is working.
+    """
+
+    def __init__(self, budget: int):
+        """
+        Construct a new text cache that holds up to `budget` bytes of pixel
+        data. When the budget is exceeded, the least recently used text
+        surfaces are evicted.
+        """
+        self._budget = budget
+        self._fonts = {}
+        self._surfaces = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_font(self, size: int,
+                 family: str = DEFAULT_FAMILY) -> pygame.font.Font:
+        """
+        Get the font of the given family and size, resolving it only if it
+        hasn't been resolved before.
+        """
+        key = (family, size)
+        font = self._fonts.get(key)
+        if font is None:
+            font = pygame.font.SysFont(family, size)
+            self._fonts[key] = font
+        return font
+
+    def render(self, text: str, size: int, color='white',
+               antialias: bool = True,
+               family: str = DEFAULT_FAMILY) -> pygame.Surface:
+        """
+        Get a surface with the given text rendered onto it, rendering it only
+        if it isn't already cached. The arguments have the same meaning as
+        they do for `pygame.font.Font.render()`.
+        """
+        key = (family, size, text, antialias, color)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._hits += 1
+            self._surfaces.move_to_end(key)
+            return surface
+
+        self._misses += 1
+        surface = self.get_font(size, family).render(text, antialias, color)
+        self._surfaces[key] = surface
+        self._bytes += surface.get_pitch() * surface.get_height()
+
+        # Always keep at least the surface that was just rendered, even if
+        # it alone is larger than the budget.
+        while self._bytes > self._budget and len(self._surfaces) > 1:
+            _, evicted = self._surfaces.popitem(last=False)
+            self._bytes -= evicted.get_pitch() * evicted.get_height()
+            self._evictions += 1
+
+        return surface
+
+    def set_budget(self, budget: int) -> None:
+        """
+        Change the memory budget of this cache, in bytes. The new budget
+        takes effect the next time text is rendered.
+        """
+        self._budget = budget
+
+    def get_stats(self) -> dict:
+        """
+        Get the number of cache hits, misses and evictions so far, as well as
+        how many fonts, text surfaces, and bytes of pixel data the cache is
+        holding.
+        """
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'evictions': self._evictions,
+            'fonts': len(self._fonts),
+            'surfaces': len(self._surfaces),
+            'bytes': self._bytes,
+        }
+
+    def log_stats(self) -> None:
+        """
+        Log the cache statistics at the debug level.
+        """
+        stats = self.get_stats()
+        log.msg(log.DEBUG,
+                f"{stats['hits']} hit(s), {stats['misses']} miss(es), "
+                f"{stats['evictions']} eviction(s), {stats['fonts']} "
+                f"font(s), {stats['surfaces']} surface(s), "
+                f"{stats['bytes']} byte(s).")
+
+
+#  Construct a global, default text cache with a 4 MiB budget.
+_cache = TextCache(4 * 1024 * 1024)
+
+
+def get() -> TextCache:
+    """
+    Get the global, default TextCache. All text should be rendered through
+    this cache.
+    """
+    return _cache
@@ -0,0 +1,302 @@
+"""
+A small retained-mode widget layer for the menu screens. Instead of creating
+buttons and rendering text on every frame, a state handler builds a tree of
+widgets once, and then simply asks the tree to draw itself and to dispatch
+events to its widgets on every frame.
+
+All of the expensive work&mdash;scaling images and rendering
+text&mdash;happens when a widget is constructed, so drawing a
+widget is never more than a blit or two.
+
+Likewise, a `WidgetGroup` indexes its widgets by where they are on the
+screen, so a click is only ever offered to the widgets under it instead of
+to every widget.
+"""
+import pygame
+
+import text_cache
+
+
+class Widget:
+    """
+    The interface that all widgets implement. By default, a widget draws
+    nothing and ignores all events.
+    """
+
+    EVENT_TYPES = ()
+    """The types of events that the widget responds to, or `None` for all
+    of them. Events of other types are never dispatched to the widget by a
+    `WidgetGroup`."""
+
+    def blit(self, window: pygame.Surface) -> None:
+        """
+        Draw the widget onto the window.
+        """
+        pass
+
+    def dispatch_event(self, event: pygame.event.Event) -> bool:
+        """
+        Receive an event from the processor context, returning `True` if the
+        widget was activated by this event, and `False` otherwise.
+        """
+        return False
+
+    def get_rect(self) -> pygame.Rect | None:
+        """
+        Get the area of the window in which this widget responds to
+        positional events, such as clicks. Positional events outside of it
+        are never dispatched to the widget. If this is `None`, which it is
+        by default, the widget is dispatched every event.
+        """
+        return None
+
+
+class Image(Widget):
+    """
+    A static image drawn at a fixed position.
+    """
+
+    def __init__(self, x, y, image: pygame.Surface):
+        self._image = image
+        self._pos = (x, y)
+
+    def blit(self, window):
+        window.blit(self._image, self._pos)
+
+
+class Label(Widget):
+    """
+    A line of static text of the given font size, horizontally centered on
+    `x` with its top edge at `y`. The text is rendered once, when the label
+    is constructed.
+    """
+
+    def __init__(self, x, y, size: int, text: str, color='white'):
+        self._text = text_cache.get().render(text, size, color)
+        self._pos = (x - (self._text.get_width() / 2), y)
+
+    def blit(self, window):
+        window.blit(self._text, self._pos)
+
+
+class Button(Widget):
+    """
+    A simple class that represents a Pygame button. Note that this class does
+    *not* use the Pygame GUI module; rather, it simply blits an image to the
+    window and monitors incoming events to know if that area was clicked.
+    """
+
+    SIZE = (200, 100)
+    """The size of all buttons, in pixels."""
+
+    EVENT_TYPES = (pygame.MOUSEBUTTONUP,)
+    """Buttons only respond to the mouse button being released. State
+    handlers whose only input is buttons can return these from
+    `StateHandler.get_event_types()`."""
+
+    def __init__(self, x, y, image, text):
+        """
+        Create a new Button using `image` as the background and `text` as the
+        text. If `image` isn't already the size of a button, it is scaled to
+        fit, so buttons that share the same background should be passed a
+        pre-scaled image.
+        """
+        if image.get_size() != Button.SIZE:
+            image = pygame.transform.scale(image, Button.SIZE)
+
+        self._image = image
+        self._rect = self._image.get_rect()
+        self._rect.topleft = (x, y)
+        self._text = text_cache.get().render(text, 50, "white")
+        self._text_pos = (
+            self._rect.x + 100 - (self._text.get_width() / 2),
+            self._rect.y + 55 - (self._text.get_height() / 2))
+
+    def blit(self, window):
+        """
+        Draw the button image on the screen.
+        """
+        window.blit(self._image, self._rect.topleft)
+        window.blit(self._text, self._text_pos)
+
+    def dispatch_event(self, event) -> bool:
+        """
+        Receive an event from the processor context and use it to determine
+        whether this button was clicked, returning `False` if this event does
+        not indicate a click of this button and `True` if it does.
+        """
+
+        # Only respond to mouse up events
+        if event.type == pygame.MOUSEBUTTONUP:
+            # Get mouse position when the event was fired.
+            # We don't want to use the current mouse position because it
+            # may have changed since the event was dispatched to us.
+            pos = event.__dict__['pos']
+
+            # If the click was inside our bounding box, this button was
+            # pressed.
+            return self._rect.collidepoint(pos)
+        # Not even a mouse up event, so this can't be a click
+        return False
+
+    def get_rect(self):
+        return self._rect
+
+
+class WidgetGroup(Widget):
+    """
+    A container of widgets, which are drawn in the order they were added.
+    Menus are built by adding all of their widgets to a group once, after
+    which only the group has to be drawn and given events.
+
+    Buttons added with `add_button()` share a single scaled background
+    image, so building a menu only scales the button image once, no matter
+    how many buttons it has.
+
+    Widgets with a rectangle are indexed in a grid of `CELL` sized cells,
+    which is how positional events find the widgets under them. Widgets
+    that don't respond to any events aren't indexed at all.
+    """
+
+    EVENT_TYPES = None
+
+    CELL = 100
+    """The size of a cell of the spatial index, in pixels."""
+
+    def __init__(self, button_image: pygame.Surface = None):
+        self._widgets = []
+        # Widgets that respond to any events at all
+        self._responsive = []
+        # Those of them without a rectangle, which get every event
+        self._unplaced = []
+        # Widgets with a rectangle, by the cells that rectangle touches
+        self._cells = {}
+        # Returned by dispatch_events(), which reuses it every time
+        self._activated = []
+        self._button_image = button_image
+        if (button_image is not None and
+                button_image.get_size() != Button.SIZE):
+            self._button_image = pygame.transform.scale(button_image,
+                                                        Button.SIZE)
+
+    def add(self, widget: Widget) -> Widget:
+        """
+        Add a widget to this group, returning the widget. The widget's
+        rectangle must not change once it has been added.
+        """
+        self._widgets.append(widget)
+        if widget.EVENT_TYPES == ():
+            return widget
+
+        self._responsive.append(widget)
+        rect = widget.get_rect()
+        if rect is None:
+            self._unplaced.append(widget)
+        else:
+            for cell in self._cells_of(rect):
+                self._cells.setdefault(cell, []).append(widget)
+        return widget
+
+    def _cells_of(self, rect: pygame.Rect):
+        for x in range(rect.left // self.CELL,
+                       (rect.right - 1) // self.CELL + 1):
+            for y in range(rect.top // self.CELL,
+                           (rect.bottom - 1) // self.CELL + 1):
+                yield x, y
+
+    def _targets(self, event) -> list[Widget]:
+        # The widgets that the event could concern, going by its position.
+        # Whether they take its type is left to the caller, so that nothing
+        # has to be allocated for it. The lists are the index's own, and
+        # must not be changed.
+        pos = getattr(event, 'pos', None)
+        if pos is None:
+            return self._responsive
+        cell = (int(pos[0]) // self.CELL, int(pos[1]) // self.CELL)
+        targets = self._cells.get(cell, ())
+        if self._unplaced:
+            targets = self._unplaced + list(targets)
+        return targets
+
+    def add_button(self, x, y, text) -> Button:
+        """
+        Create a new button using this group's shared button image, and add
+        it to this group.
+        """
+        return self.add(Button(x, y, self._button_image, text))
+
+    def blit(self, window):
+        for widget in self._widgets:
+            widget.blit(window)
+
+    def dispatch_event(self, event) -> bool:
+        for widget in self._targets(event):
+            if ((widget.EVENT_TYPES is None
+                 or event.type in widget.EVENT_TYPES)
+                    and widget.dispatch_event(event)):
+                return True
+        return False
+
+    def dispatch_events(self, events) -> list[Widget]:
+        """
+        Dispatch all the given events to the widgets in this group that they
+        concern, returning the widgets that were activated, in the order they
+        were activated. The returned list is reused by the next call, so it
+        must not be kept around.
+        """
+        activated = self._activated
+        activated.clear()
+        for event in events:
+            for widget in self._targets(event):
+                if ((widget.EVENT_TYPES is None
+                     or event.type in widget.EVENT_TYPES)
+                        and widget.dispatch_event(event)):
+                    activated.append(widget)
+        return activated
+
+
+class StaticLayer(Widget):
+    """
+    A layer that composites everything that doesn't change on a screen into
+    a single cached surface, so that drawing the whole static part of the
+    screen costs a single blit. The layer is only composited again when the
+    window size changes, or when it is explicitly invalidated because the
+    data it displays changed.
+    """
+
+    def __init__(self, draw, fill=(100, 100, 100)):
+        """
+        Create a new static layer. `draw` is a function that takes a surface
+        and draws everything in the layer onto it, such as the `blit()`
+        function of a `WidgetGroup`. It is only invoked when the layer is
+        composited. The layer is filled with `fill` before `draw` is called.
+        """
+        self._draw = draw
+        self._fill = fill
+        self._surface = None
+
+    def invalidate(self) -> None:
+        """
+        Throw away the composited layer, so that it is composited again the
+        next time it is needed.
+        """
+        self._surface = None
+
+    def prepare(self, size: tuple[int, int]) -> None:
+        """
+        Composite the layer at the given size, unless it is already
+        composited at that size. This should be called in `on_enter()`, so
+        that no compositing has to happen while frames are being drawn.
+        """
+        if self._surface is not None and self._surface.get_size() == size:
+            return
+
+        self._surface = pygame.Surface(size)
+        if pygame.display.get_surface() is not None:
+            self._surface = self._surface.convert()
+        self._surface.fill(self._fill)
+        self._draw(self._surface)
+
+    def blit(self, window):
+        self.prepare(window.get_size())
+        window.blit(self._surface, (0, 0))
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The game is run from its src directory, where its modules import each
+# other by their plain names, so the tests import them the same way. That
+# way, there is only ever one copy of each module, and the tests run the
+# same one that the game does.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
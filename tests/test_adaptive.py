@@ -0,0 +1,73 @@
+import random
+
+import pytest
+from adaptive import (BUCKETS, CATEGORIES, OPERATORS, SkillModel,
+                      generate_problem, get_key)
+
+def _share(model, category, n=2000):
+    return sum(model.choose() == category for _ in range(n)) / n
+
+def test_new_player():
+    model = SkillModel(random.Random(350))
+    # A new player mostly gets small additions, and hardly ever negative
+    # divisions.
+    assert _share(model, ('+', 'small')) > 0.3
+    assert _share(model, ('/', 'negative')) < 0.05
+
+def test_generate():
+    model = SkillModel(random.Random(350))
+    for _ in range(500):
+        (sign, bucket), (text, answer) = model.generate()
+        a, text_sign, b = text.split()
+        assert text_sign == sign
+        assert float(eval(text)) == answer == int(answer)
+        if bucket == 'negative':
+            assert int(a) < 0 or int(b) < 0
+        elif bucket == 'small':
+            assert 0 <= int(a) <= 5 and 0 <= int(b) <= 5
+
+def test_generate_problem():
+    for category in CATEGORIES:
+        text, answer = generate_problem(get_key(category))
+        assert text.split()[1] == category[0]
+        assert float(eval(text)) == answer
+
+def test_record():
+    model = SkillModel()
+    category = ('*', 'large')
+    before = model.get_expected(category)
+    model.record(category, True, 1.0)
+    assert model.get_expected(category) > before
+    rating = model.get_skill(category).rating
+    model.record(category, False, 1.0)
+    assert model.get_skill(category).rating < rating
+    # A slow answer counts for less than a fast one.
+    fast = SkillModel()
+    slow = SkillModel()
+    fast.record(category, True, 1.0)
+    slow.record(category, True, 30.0)
+    assert fast.get_skill(category).rating > slow.get_skill(category).rating
+
+def test_adapts():
+    # A player who gets everything right is soon asked harder problems.
+    model = SkillModel(random.Random(350))
+    for _ in range(300):
+        category, _ = model.generate()
+        model.record(category, True, 1.0)
+    assert _share(model, ('+', 'small')) < 0.2
+    assert _share(model, ('/', 'small')) > 0.1
+
+def test_dict():
+    model = SkillModel()
+    model.record(('-', 'small'), True, 2.0)
+    model.record(('-', 'small'), False, 4.0)
+    data = model.to_dict()
+    assert list(data) == ['-small']
+    data['?huge'] = [1, 2, 3]
+    data['+large'] = 'nonsense'
+    loaded = SkillModel.from_dict(data)
+    assert loaded.to_dict() == model.to_dict()
+    for sign in OPERATORS:
+        for bucket in BUCKETS:
+            assert loaded.get_expected((sign, bucket)) == pytest.approx(
+                model.get_expected((sign, bucket)), abs=1e-3)
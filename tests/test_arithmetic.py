@@ -1,5 +1,6 @@
+import numpy
 import pytest
-from src.arithmetic import generate_arithmetic
+from arithmetic import generate_arithmetic, generate_batch
 
 def test_easy():
     result = generate_arithmetic("easy")
@@ -32,3 +33,25 @@ def test_invalid():
 
     with pytest.raises(AssertionError):
         generate_arithmetic("normal")
+
+def test_batch():
+    rng = numpy.random.default_rng(350)
+    for mode, signs in (("easy", {'+', '-'}),
+                        ("MEDIUM", {'+', '-', '*', '/'}),
+                        ("hard", {'+', '-', '*', '/'})):
+        problems, answers = generate_batch(mode, 5000, rng)
+        assert problems.shape == answers.shape == (5000,)
+        assert {problem.split()[1] for problem in problems} == signs
+        for problem, answer in zip(problems[:500], answers[:500]):
+            a, sign, b = problem.split()
+            assert float(eval(problem)) == answer
+            assert answer == int(answer)
+            if sign == '/':
+                assert int(b) != 0
+
+    problems, answers = generate_batch("easy", 0)
+    assert len(problems) == len(answers) == 0
+
+def test_batch_invalid():
+    with pytest.raises(AssertionError):
+        generate_batch("normal", 10)
@@ -0,0 +1,201 @@
+import random
+
+import pygame
+import obstacle
+from collision import collide_mask, get_mask, sweep, sweep_mask
+
+def test_static_overlap():
+    a = pygame.Rect(0, 0, 10, 10)
+    assert sweep(a, 0, 0, pygame.Rect(5, 5, 10, 10)) == 0
+    assert sweep(a, 0, 0, pygame.Rect(10, 0, 10, 10)) is None
+    assert sweep(a, 0, 0, pygame.Rect(50, 50, 10, 10)) is None
+
+def test_time_of_impact():
+    a = pygame.Rect(0, 0, 10, 10)
+    assert sweep(a, 20, 0, pygame.Rect(15, 0, 10, 10)) == 0.25
+    assert sweep(a, -20, 0, pygame.Rect(-15, 0, 10, 10)) == 0.25
+    assert sweep(a, 0, 20, pygame.Rect(0, 20, 10, 10)) == 0.5
+
+def test_tunneling():
+    # Moving far past a thin target within one frame still hits it.
+    a = pygame.Rect(0, 0, 10, 10)
+    assert sweep(a, 10000, 0, pygame.Rect(500, 0, 1, 10)) is not None
+    assert sweep(a, 10000, 0, pygame.Rect(500, 20, 1, 10)) is None
+    assert sweep(a, 10000, 0, pygame.Rect(-500, 0, 1, 10)) is None
+
+def test_stress():
+    # Scroll obstacles past a player standing on the ground at extreme
+    # speeds, for thousands of frames. Every single obstacle has to hit.
+    rng = random.Random(350)
+    player = pygame.Rect(400, 300, 40, 100)
+    obstacle = pygame.Rect(0, 275, 50, 125)
+
+    for speed in (1, 49, 50, 51, 100, 333, 1000, 5000):
+        spawned = 0
+        hits = 0
+        x = 900
+        for _ in range(5000):
+            x -= speed
+            obstacle.x = x
+            start = player.move(-speed, 0)
+            if sweep(start, speed, 0, obstacle) is not None:
+                hits += 1
+                x = rng.randint(905, 1800)
+                spawned += 1
+            elif x + obstacle.width < player.left:
+                x = rng.randint(905, 1800)
+                spawned += 1
+        assert spawned > 0
+        assert hits == spawned
+
+def test_stress_jump():
+    # A player high enough in the air never hits, at any speed.
+    player = pygame.Rect(400, 0, 40, 100)
+    obstacle = pygame.Rect(0, 275, 50, 125)
+
+    for speed in range(1, 3000, 7):
+        obstacle.x = 900
+        for _ in range(100):
+            obstacle.x -= speed
+            start = player.move(-speed, 0)
+            assert sweep(start, speed, 0, obstacle) is None
+
+def _step(manager, player, speed, answered, rng, images):
+    # One step of the level: scroll, stopping short of the jump window if
+    # the player has answered, then spawn obstacles up to two screens
+    # ahead, with gaps that grow with the speed.
+    distance = speed
+    if answered:
+        ahead = manager.upcoming(player.left).rect
+        distance = min(speed, max(ahead.left - 50 - player.right, 0))
+    manager.scroll(distance, -51)
+    last = manager.last()
+    while last is None or last.rect.left < 1800:
+        x = 950 if last is None else (last.rect.left + rng.randint(450, 900)
+                                      + speed * 45)
+        image = rng.choice(images)
+        last = manager.spawn(image, x, 455 - image.get_height())
+    return distance
+
+def test_stress_level():
+    # Run the level's steps on the obstacle manager for thousands of steps
+    # at extreme speeds, with obstacles recycled a frame late. No obstacle
+    # ever gets past a player who doesn't jump, and a player who has
+    # answered always gets the jump window of an obstacle before running
+    # into it.
+    rng = random.Random(350)
+    images = [pygame.Surface((50, 125)), pygame.Surface((36, 90))]
+    player = pygame.Rect(430, 330, 40, 100)
+
+    for speed in (1, 49, 50, 51, 100, 333, 1000, 5000):
+        for answering in (False, True):
+            manager = obstacle.ObstacleManager()
+            hits = set()
+            windows = set()
+            for _ in range(5000):
+                ahead = manager.upcoming(player.left)
+                answered = (answering and ahead is not None
+                            and ahead.position not in windows)
+                distance = _step(manager, player, speed, answered, rng,
+                                 images)
+
+                hit = manager.sweep(player, player)
+                if hit is not None:
+                    assert not answering or hit.position in windows
+                    hits.add(hit.position)
+                ahead = manager.upcoming(player.left - distance)
+                if answered and player.right >= ahead.rect.left - 50:
+                    windows.add(ahead.position)
+
+                first = manager.first()
+                assert (first.rect.right >= player.left
+                        or first.position in hits)
+            assert hits
+
+def _ring():
+    # A 20x20 sprite that is only solid along its border.
+    surface = pygame.Surface((20, 20), pygame.SRCALPHA)
+    pygame.draw.rect(surface, 'white', surface.get_rect(), 2)
+    return surface
+
+def test_mask_cache():
+    surface = _ring()
+    assert get_mask(surface) is get_mask(surface)
+    assert get_mask(surface).count() < 20 * 20
+
+def test_collide_mask():
+    ring = pygame.Rect(0, 0, 20, 20)
+    mask = get_mask(_ring())
+    dot = pygame.Rect(0, 0, 2, 2)
+    dot_mask = pygame.mask.Mask((2, 2), fill=True)
+    # Inside the hole of the ring, the rectangles overlap but nothing hits.
+    assert not collide_mask(dot.move(9, 9), dot_mask, ring, mask)
+    assert collide_mask(dot.move(0, 9), dot_mask, ring, mask)
+    assert not collide_mask(dot.move(30, 9), dot_mask, ring, mask)
+
+def test_sweep_mask():
+    ring = pygame.Rect(100, 0, 20, 20)
+    mask = get_mask(_ring())
+    dot = pygame.Rect(0, 9, 2, 2)
+    dot_mask = pygame.mask.Mask((2, 2), fill=True)
+    # Passing through the ring hits its left side, even at high speed.
+    for speed in (120, 200, 5000):
+        time = sweep_mask(dot, dot_mask, speed, 0, ring, mask)
+        assert time is not None
+        assert 98 <= speed * time <= 100
+    # Stopping inside the hole of the ring never reaches the ring itself.
+    assert sweep_mask(pygame.Rect(105, 5, 2, 2), dot_mask, 7, 7, ring,
+                      mask) is None
+    # A sprite with nothing but a line along its top is never hit from the
+    # side, even though the rectangles overlap.
+    line = pygame.Surface((20, 20), pygame.SRCALPHA)
+    pygame.draw.line(line, 'white', (0, 0), (19, 0))
+    assert sweep_mask(dot, dot_mask, 5000, 0, ring, get_mask(line)) is None
+
+def test_sweep_many(monkeypatch):
+    # With thousands of obstacles in the manager, a sweep only tests the
+    # handful around the rectangle.
+    manager = obstacle.ObstacleManager()
+    image = pygame.Surface((50, 125))
+    for x in range(0, 200000, 100):
+        manager.spawn(image, x, 275)
+    assert len(manager) == 2000
+
+    tested = []
+
+    def counted(start, dx, dy, rect):
+        tested.append(rect.x)
+        return sweep(start, dx, dy, rect)
+
+    monkeypatch.setattr(obstacle.collision, "sweep", counted)
+    manager.scroll(30, -51)
+    player = pygame.Rect(100020, 100, 40, 100)
+    assert manager.sweep(player.copy(), player) is None
+    # Relative to the obstacles, the player moved from 99990 to 100020,
+    # and only the obstacle at 99970 reaches into that.
+    assert tested == [99970]
+
+    player.y = 300
+    hit = manager.sweep(player.copy(), player)
+    assert hit is not None and hit.rect.x == 99970
+    assert len(tested) == 2
+
+    # Recycled obstacles go back into the pool instead of being dropped.
+    manager.scroll(100000, 49950)
+    assert len(manager) == 1500
+    manager.spawn(image, 5000, 275)
+    assert len(manager._pool) == 499
+
+def test_upcoming():
+    manager = obstacle.ObstacleManager()
+    wide = pygame.Surface((50, 125))
+    narrow = pygame.Surface((36, 90))
+    for x, image in ((100, wide), (300, narrow), (500, wide)):
+        manager.spawn(image, x, 275)
+    assert manager.upcoming(0).rect.x == 100
+    assert manager.upcoming(150).rect.x == 100
+    assert manager.upcoming(151).rect.x == 300
+    assert manager.upcoming(337).rect.x == 500
+    assert manager.upcoming(551) is None
+    manager.scroll(200, -51)
+    assert manager.upcoming(0).rect.x == 100
@@ -0,0 +1,44 @@
+import os
+
+import pygame
+import pytest
+from event_router import EventRouter
+
+@pytest.fixture
+def router():
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    yield EventRouter()
+    pygame.event.set_allowed(None)
+    pygame.display.quit()
+
+def _motion(x, y):
+    return pygame.event.Event(pygame.MOUSEMOTION, pos=(x, y), rel=(1, 2),
+                              buttons=(0, 0, 0))
+
+def _up(x, y):
+    return pygame.event.Event(pygame.MOUSEBUTTONUP, pos=(x, y), button=1)
+
+def test_coalesce(router):
+    router.subscribe(None)
+    events = router.route([_motion(1, 1), _motion(2, 2), _motion(3, 3),
+                           _up(3, 3), _motion(4, 4)])
+    assert [event.type for event in events] == [
+        pygame.MOUSEMOTION, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION]
+    assert events[0].pos == (3, 3)
+    assert events[0].rel == (3, 6)
+    assert events[2].pos == (4, 4)
+
+def test_subscribe(router):
+    router.subscribe((pygame.MOUSEBUTTONUP,))
+    assert pygame.event.get_blocked(pygame.MOUSEMOTION)
+    assert not pygame.event.get_blocked(pygame.MOUSEBUTTONUP)
+
+    quit_event = pygame.event.Event(pygame.QUIT)
+    events = router.route([_motion(1, 1), _up(1, 1), quit_event])
+    assert [event.type for event in events] == [
+        pygame.MOUSEBUTTONUP, pygame.QUIT]
+
+    router.subscribe(None)
+    assert not pygame.event.get_blocked(pygame.MOUSEMOTION)
+    assert len(router.route([_motion(1, 1), _up(1, 1)])) == 2
@@ -0,0 +1,65 @@
+import random
+from fractions import Fraction
+
+import pytest
+from expression import ExpressionGenerator, check_answer, parse_answer
+
+def _value(text):
+    # Python itself agrees on precedence, if not on exactness.
+    return eval(text)
+
+def test_templates():
+    assert len(ExpressionGenerator(operators="+", operands=(2, 2))) == 1
+    # Two shapes of three operands, with four operators in each of the two
+    # places.
+    assert len(ExpressionGenerator(operands=(3, 3))) == 2 * 4 * 4
+    assert len(ExpressionGenerator(operands=(2, 4))) == 4 + 32 + 5 * 64
+    with pytest.raises(ValueError):
+        ExpressionGenerator(operands=(3, 2))
+
+def test_generate():
+    generator = ExpressionGenerator(-10, 10, operands=(2, 4),
+                                    rng=random.Random(350))
+    for _ in range(2000):
+        text, answer = generator.generate()
+        assert isinstance(answer, Fraction)
+        assert _value(text) == pytest.approx(float(answer))
+        for token in text.replace('(', ' ').replace(')', ' ').split():
+            if token not in '+-*/':
+                assert -10 <= int(token) <= 10
+
+def test_precedence():
+    generator = ExpressionGenerator(operators="-/", operands=(3, 3))
+    texts = {text for text, _, _ in generator._groups[0]}
+    assert texts == {
+        "{0} - {1} - {2}", "{0} - ({1} - {2})", "{0} / {1} - {2}",
+        "{0} / ({1} - {2})", "({0} - {1}) / {2}", "{0} - {1} / {2}",
+        "{0} / {1} / {2}", "{0} / ({1} / {2})"}
+
+def test_no_parentheses():
+    generator = ExpressionGenerator(operands=(2, 4), parentheses=False)
+    for _ in range(200):
+        assert '(' not in generator.generate()[0]
+
+def test_large_operands():
+    generator = ExpressionGenerator(-10**12, 10**12, operands=(4, 4),
+                                    rng=random.Random(350))
+    for _ in range(200):
+        text, answer = generator.generate()
+        assert _value(text) == pytest.approx(float(answer))
+
+def test_parse_answer():
+    assert parse_answer("3/4") == Fraction(3, 4)
+    assert parse_answer(" -3 / 4 ") == Fraction(-3, 4)
+    assert parse_answer("0.75") == Fraction(3, 4)
+    assert parse_answer("12") == 12
+    assert parse_answer("") is None
+    assert parse_answer("1/0") is None
+    assert parse_answer("three") is None
+
+def test_check_answer():
+    assert check_answer("1/3", Fraction(1, 3))
+    # 0.333 is close, but not exact.
+    assert not check_answer("0.333", Fraction(1, 3))
+    assert check_answer("6/2", 3.0)
+    assert not check_answer("x", 3.0)